@@ -1,18 +1,49 @@
 #!/usr/bin/env python3
 import argparse
+import base64
+import contextlib
+import gzip
 import hashlib
+import heapq
+import http.client
 import json
+import math
 import os
+import queue
 import random
+import secrets
+import shutil
+import ssl
 import sys
+import tempfile
+import threading
 import time
-import urllib.error
 import urllib.parse
 import urllib.request
-from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 KIE_CREATE_TASK_URL = "https://api.kie.ai/api/v1/jobs/createTask"
 KIE_QUERY_TASK_URL = "https://api.kie.ai/api/v1/jobs/recordInfo"
+DEFAULT_POLL_HISTORY_PATH = os.path.join(".temp", "model-example-poll-history.json")
+POLL_HISTORY_LIMIT = 50
+JOURNAL_FILENAME = "journal.jsonl"
+TASK_MANIFEST_FILENAME = "manifest.ndjson"
+RAW_SIDECAR_FILENAME = "raw-responses.ndjson.gz"
+DEFAULT_CACHE_DIR = os.path.join(".temp", "model-example-cache")
+DEFAULT_CACHE_MAX_MB = 2048
+DEFAULT_BLOB_DIR = os.path.join(".temp", "model-example-blobs")
+DEFAULT_BLOB_MAX_MB = 4096
+CALLBACK_PATH = "/kie-callback"
+CALLBACK_WAKE_SECONDS = 0.25
+DEFAULT_TASK_BUDGET_DIR = os.path.join(tempfile.gettempdir(), "model-example-task-budget")
+TASK_BUDGET_POLL_SECONDS = 0.05
 
 DEFAULT_TYPES = [
     "fantasy-epic",
@@ -442,6 +473,15 @@ PROMPT_VARIANTS = {
 }
 
 
+def parse_model_uuids(raw_model_uuids: str) -> List[str]:
+    model_uuids = []
+    for item in raw_model_uuids.split(","):
+        item = item.strip()
+        if item and item not in model_uuids:
+            model_uuids.append(item)
+    return model_uuids
+
+
 def parse_types(raw_types: str) -> List[str]:
     if not raw_types:
         return DEFAULT_TYPES.copy()
@@ -481,6 +521,50 @@ def pick_unique_subject_anchor(run_id: str, style_key: str, used_anchors: set) -
     raise RuntimeError("Failed to pick a unique subject anchor")
 
 
+NEGATIVE_CLAUSE = NEGATIVE_FRAGMENT.replace(", ", ", no ")
+BULK_SEED_SALT = "bulk-prompts"
+
+
+def prompt_theme_fragment(theme: str, style_key: str) -> str:
+    theme_value = theme.strip() if theme and theme.strip() else DEFAULT_THEMES.get(
+        style_key, "anime model showcase benchmark"
+    )
+    normalized_theme = theme_value.lower().strip()
+    if (
+        theme_value
+        and normalized_theme != "model capability benchmark set"
+        and normalized_theme != "anime model capability benchmark set"
+    ):
+        return f"{theme_value}, "
+    return ""
+
+
+def prompt_subject_phrase(character: str, lock_character: bool, subject_anchor: str) -> str:
+    if lock_character and character:
+        return f"{character} as the primary subject with consistent visual identity"
+    if character:
+        return f"a distinct {subject_anchor} as the primary subject, subtly inspired by {character}"
+    return f"a distinct {subject_anchor} as the primary subject"
+
+
+def compose_prompt(
+    theme_fragment: str,
+    subject_phrase: str,
+    scene: str,
+    style_note: str,
+    category_description: str,
+    camera_variant: str,
+    mood_variant: str,
+    detail_variant: str,
+    quality_variant: str,
+) -> str:
+    return (
+        f"{theme_fragment}{subject_phrase}, {scene}, {style_note}, "
+        f"{category_description}, {camera_variant}, {mood_variant}, {detail_variant}, "
+        f"{quality_variant}, no unrelated aesthetics, no repeated identity motifs, no {NEGATIVE_CLAUSE}"
+    )
+
+
 def build_prompt(
     theme: str,
     character: str,
@@ -492,53 +576,41 @@ def build_prompt(
     profile = STYLE_CATALOG[style_key]
     scene = pick_variant(run_id, style_key, 11, profile["scenes"])
     style_note = pick_variant(run_id, style_key, 12, profile["style_notes"])
-    theme_value = theme.strip() if theme and theme.strip() else DEFAULT_THEMES.get(
-        style_key, "anime model showcase benchmark"
-    )
-
-    subject_phrase = f"a distinct {subject_anchor} as the primary subject"
-    if lock_character and character:
-        subject_phrase = f"{character} as the primary subject with consistent visual identity"
-    elif character:
-        subject_phrase = (
-            f"a distinct {subject_anchor} as the primary subject, subtly inspired by {character}"
-        )
-
     camera_variant = pick_variant(run_id, style_key, 1, PROMPT_VARIANTS["camera"])
     mood_variant = pick_variant(run_id, style_key, 2, PROMPT_VARIANTS["mood"])
     detail_variant = pick_variant(run_id, style_key, 3, PROMPT_VARIANTS["detail"])
     quality_variant = pick_variant(run_id, style_key, 4, QUALITY_FRAGMENT_POOL)
     category = STYLE_CATEGORY_MAP.get(style_key, "fine-detail")
-    category_description = CATEGORY_DESCRIPTIONS[category]
+    return compose_prompt(
+        prompt_theme_fragment(theme, style_key),
+        prompt_subject_phrase(character, lock_character, subject_anchor),
+        scene,
+        style_note,
+        CATEGORY_DESCRIPTIONS[category],
+        camera_variant,
+        mood_variant,
+        detail_variant,
+        quality_variant,
+    )
 
-    theme_fragment = ""
-    normalized_theme = theme_value.lower().strip()
-    if (
-        theme_value
-        and normalized_theme != "model capability benchmark set"
-        and normalized_theme != "anime model capability benchmark set"
-    ):
-        theme_fragment = f"{theme_value}, "
 
-    negative_clean = NEGATIVE_FRAGMENT.replace(", ", ", no ")
-    return (
-        f"{theme_fragment}{subject_phrase}, {scene}, {style_note}, "
-        f"{category_description}, {camera_variant}, {mood_variant}, {detail_variant}, "
-        f"{quality_variant}, no unrelated aesthetics, no repeated identity motifs, no {negative_clean}"
+def build_payload(args: argparse.Namespace, style_key: str, subject_anchor: str) -> Dict:
+    payload = payload_template(args)
+    payload["prompt"] = build_prompt(
+        args.theme,
+        args.character,
+        style_key,
+        args.lock_character,
+        args.run_id,
+        subject_anchor,
     )
+    return payload
 
 
-def build_payload(args: argparse.Namespace, style_key: str, subject_anchor: str) -> Dict:
+def payload_template(args: argparse.Namespace) -> Dict:
     payload = {
         "gen_type": "anime",
-        "prompt": build_prompt(
-            args.theme,
-            args.character,
-            style_key,
-            args.lock_character,
-            args.run_id,
-            subject_anchor,
-        ),
+        "prompt": "",
         "model_uuid": args.model_uuid,
         "aspect_ratio": args.aspect_ratio,
         "batch_size": args.batch_size,
@@ -555,6 +627,117 @@ def build_payload(args: argparse.Namespace, style_key: str, subject_anchor: str)
     return payload
 
 
+def build_payloads(args: argparse.Namespace, style_types: List[str]) -> List[Dict]:
+    used_subject_anchors = set()
+    payloads = []
+    for style_key in style_types:
+        subject_anchor = pick_unique_subject_anchor(args.run_id, style_key, used_subject_anchors)
+        payloads.append(build_payload(args, style_key, subject_anchor))
+    return payloads
+
+
+def bulk_prompt_axes(args: argparse.Namespace, style_key: str) -> List[List[str]]:
+    profile = STYLE_CATALOG[style_key]
+    # A locked character replaces the anchor, so that axis would only yield duplicates.
+    anchors = [""] if args.lock_character and args.character else SUBJECT_ANCHOR_POOL
+    subjects = [
+        f"{prompt_subject_phrase(args.character, args.lock_character, anchor)}, drawn as {subject}"
+        for anchor in anchors
+        for subject in profile["subjects"]
+    ]
+    return [
+        subjects,
+        list(profile["scenes"]),
+        list(profile["style_notes"]),
+        PROMPT_VARIANTS["camera"],
+        PROMPT_VARIANTS["mood"],
+        PROMPT_VARIANTS["detail"],
+        QUALITY_FRAGMENT_POOL,
+    ]
+
+
+def bulk_prompt_space(axes: List[List[str]]) -> int:
+    space = 1
+    for values in axes:
+        space *= len(values)
+    return space
+
+
+def bulk_permutation(run_id: str, style_key: str, space: int) -> Tuple[int, int]:
+    seed_input = f"{run_id}:{style_key}:{BULK_SEED_SALT}"
+    seed = int(hashlib.sha256(seed_input.encode("utf-8")).hexdigest()[:24], 16)
+    rnd = random.Random(seed)
+    stride = rnd.randrange(1, space) if space > 1 else 1
+    while math.gcd(stride, space) != 1:
+        stride += 1
+    return stride, rnd.randrange(space)
+
+
+def iter_style_prompts(args: argparse.Namespace, style_key: str, count: int) -> Iterator[str]:
+    axes = bulk_prompt_axes(args, style_key)
+    space = bulk_prompt_space(axes)
+    theme_fragment = prompt_theme_fragment(args.theme, style_key)
+    category_description = CATEGORY_DESCRIPTIONS[STYLE_CATEGORY_MAP.get(style_key, "fine-detail")]
+    stride, offset = bulk_permutation(args.run_id, style_key, space)
+    radices = [len(values) for values in axes]
+    for position in range(count):
+        # stride is coprime with space, so position -> combination is a bijection and never repeats.
+        combination = (offset + position * stride) % space
+        picks = []
+        for values, radix in zip(axes, radices):
+            combination, digit = divmod(combination, radix)
+            picks.append(values[digit])
+        subject, scene, style_note, camera, mood, detail, quality = picks
+        yield compose_prompt(
+            theme_fragment, subject, scene, style_note, category_description, camera, mood, detail, quality
+        )
+
+
+def iter_bulk_payloads(args: argparse.Namespace, style_types: List[str], per_style: int) -> Iterator[Dict]:
+    for style_key in style_types:
+        space = bulk_prompt_space(bulk_prompt_axes(args, style_key))
+        if per_style > space:
+            raise ValueError(f"{style_key} has only {space} unique prompt combinations, requested {per_style}")
+    return _iter_bulk_payloads(args, style_types, per_style)
+
+
+def _iter_bulk_payloads(args: argparse.Namespace, style_types: List[str], per_style: int) -> Iterator[Dict]:
+    template = payload_template(args)
+    for style_key in style_types:
+        for prompt in iter_style_prompts(args, style_key, per_style):
+            payload = dict(template)
+            payload["prompt"] = prompt
+            yield payload
+
+
+def fan_out(payloads: Iterable[Dict], model_uuids: List[str]) -> Iterator[Dict]:
+    # Every model gets the same prompt; interleaving keeps all models moving through the scheduler together.
+    for payload in payloads:
+        for model_uuid in model_uuids:
+            yield dict(payload, model_uuid=model_uuid)
+
+
+def model_output_dir(output_dir: str, model_uuid: str) -> str:
+    return os.path.join(output_dir, "models", slugify(model_uuid))
+
+
+def task_placements(payloads: List[Dict], output_dir: str) -> List[Tuple[str, int]]:
+    model_uuids = {payload.get("model_uuid", "") for payload in payloads}
+    if len(model_uuids) <= 1:
+        return [(output_dir, position + 1) for position in range(len(payloads))]
+
+    counts: Dict[str, int] = {}
+    placements = []
+    for payload in payloads:
+        model_uuid = payload.get("model_uuid", "")
+        counts[model_uuid] = counts.get(model_uuid, 0) + 1
+        task_dir = model_output_dir(output_dir, model_uuid)
+        if output_dir:
+            os.makedirs(task_dir, exist_ok=True)
+        placements.append((task_dir, counts[model_uuid]))
+    return placements
+
+
 def load_env() -> None:
     for env_file in [".env.production", ".env.development", ".env"]:
         if not os.path.exists(env_file):
@@ -595,24 +778,725 @@ def resolve_provider_headers(provider: str, headers: Dict[str, str]) -> Dict[str
     return merged
 
 
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# http.client sends no User-Agent; some result-image CDNs reject requests without one.
+DEFAULT_USER_AGENT = "Mozilla/5.0"
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_MAX_ATTEMPTS = 4
+RequestBody = Optional[Union[bytes, Callable[[], Iterable[bytes]]]]
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A create call rejected with one of these never started a task, so it is safe to resend.
+UNSENT_RETRY_STATUSES = {429, 503}
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 8.0
+HEDGE_WORKERS = 64
+HEDGE_LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 10
+HEDGE_QUANTILE = 0.95
+HEDGE_MAX_RATIO = 0.1
+
+
+METRICS_PREFIX = "model_example_"
+METRICS_SPAN_LIMIT = 100000
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTE_BUCKETS = tuple(1024 * 4**power for power in range(10))
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple], Dict] = {}
+        self.spans: List[Dict] = []
+        self.dropped_spans = 0
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if name.endswith("_seconds"):
+            bounds = TIME_BUCKETS
+        elif name.endswith("_bytes"):
+            bounds = BYTE_BUCKETS
+        else:
+            bounds = COUNT_BUCKETS
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.setdefault(
+                key,
+                {"bounds": bounds, "buckets": [0] * len(bounds), "count": 0, "sum": 0.0, "min": value, "max": value},
+            )
+            for position, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram["buckets"][position] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["min"] = min(histogram["min"], value)
+            histogram["max"] = max(histogram["max"], value)
+
+    def record_span(self, name: str, started: float, seconds: float, **labels) -> None:
+        self.observe(f"{name}_seconds", seconds, **{key: value for key, value in labels.items() if key != "detail"})
+        with self.lock:
+            if len(self.spans) >= METRICS_SPAN_LIMIT:
+                self.dropped_spans += 1
+                return
+            self.spans.append(
+                {
+                    "name": name,
+                    "start": round(started - self.started, 4),
+                    "seconds": round(seconds, 4),
+                    "labels": {key: str(value) for key, value in labels.items()},
+                }
+            )
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels) -> Iterator[Dict[str, str]]:
+        # Callers may add labels (e.g. status) to the yielded dict before the span closes.
+        started = time.monotonic()
+        extra: Dict[str, str] = {}
+        try:
+            yield extra
+        except BaseException as error:
+            extra.setdefault("error", type(error).__name__)
+            raise
+        finally:
+            self.record_span(name, started, time.monotonic() - started, **labels, **extra)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(histogram["bounds"], histogram["buckets"]):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                histograms.append(
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram["count"],
+                        "sum": round(histogram["sum"], 4),
+                        "min": round(histogram["min"], 4),
+                        "max": round(histogram["max"], 4),
+                        "buckets": buckets,
+                    }
+                )
+            return {
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "elapsed_seconds": round(time.monotonic() - self.started, 3),
+                "counters": counters,
+                "histograms": histograms,
+                "spans": list(self.spans),
+                "dropped_spans": self.dropped_spans,
+            }
+
+    def prometheus_text(self, snapshot: Dict) -> str:
+        def series(name: str, labels: Dict[str, str], value: float, suffix: str = "", extra: str = "") -> str:
+            pairs = [f'{key}="{value_text}"' for key, value_text in labels.items()]
+            if extra:
+                pairs.append(extra)
+            label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+            return f"{METRICS_PREFIX}{name}{suffix}{label_text} {value}"
+
+        lines = []
+        typed = set()
+        for counter in snapshot["counters"]:
+            if counter["name"] not in typed:
+                lines.append(f"# TYPE {METRICS_PREFIX}{counter['name']} counter")
+                typed.add(counter["name"])
+            lines.append(series(counter["name"], counter["labels"], counter["value"]))
+        for histogram in snapshot["histograms"]:
+            if histogram["name"] not in typed:
+                lines.append(f"# TYPE {METRICS_PREFIX}{histogram['name']} histogram")
+                typed.add(histogram["name"])
+            for bound, count in histogram["buckets"].items():
+                lines.append(series(histogram["name"], histogram["labels"], count, "_bucket", f'le="{bound}"'))
+            lines.append(series(histogram["name"], histogram["labels"], histogram["count"], "_bucket", 'le="+Inf"'))
+            lines.append(series(histogram["name"], histogram["labels"], histogram["sum"], "_sum"))
+            lines.append(series(histogram["name"], histogram["labels"], histogram["count"], "_count"))
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str) -> Tuple[str, str]:
+        snapshot = self.snapshot()
+        json_path = os.path.join(directory, "metrics.json")
+        prom_path = os.path.join(directory, "metrics.prom")
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, ensure_ascii=False, indent=2)
+        # Write-then-rename so a textfile collector never scrapes a half-written file.
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text(snapshot))
+        os.replace(prom_path + ".tmp", prom_path)
+        return json_path, prom_path
+
+
+METRICS = Metrics()
+
+
+class ResumableHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host: str, port: Optional[int], tls_sessions: Dict, **kwargs) -> None:
+        super().__init__(host, port, **kwargs)
+        self.tls_sessions = tls_sessions
+
+    def connect(self) -> None:
+        http.client.HTTPConnection.connect(self)
+        server_host = self._tunnel_host or self.host
+        session_key = (server_host, self._tunnel_port or self.port)
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_host,
+            session=self.tls_sessions.get(session_key),
+        )
+        self.tls_sessions[session_key] = self.sock.session
+
+
+def proxy_for(scheme: str, host: str) -> str:
+    proxy = urllib.request.getproxies().get(scheme, "")
+    if not proxy or urllib.request.proxy_bypass(host):
+        return ""
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def proxy_headers(proxy: str) -> Dict[str, str]:
+    parsed = urllib.parse.urlparse(proxy)
+    if parsed.username is None:
+        return {}
+    credentials = f"{urllib.parse.unquote(parsed.username)}:{urllib.parse.unquote(parsed.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")}
+
+
+class HttpClient:
+    def __init__(
+        self,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        max_idle_per_host: int = 16,
+    ) -> None:
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl.create_default_context()
+        self.tls_sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+        self.idle: Dict[Tuple[str, str, int, str], List[http.client.HTTPConnection]] = {}
+        self.lock = threading.Lock()
+
+    def _new_connection(self, scheme: str, host: str, port: int, proxy: str) -> http.client.HTTPConnection:
+        connect_host, connect_port = host, port
+        if proxy:
+            parsed = urllib.parse.urlparse(proxy)
+            if parsed.scheme != "http":
+                raise ValueError(f"Unsupported proxy scheme: {proxy}")
+            connect_host, connect_port = parsed.hostname or "", parsed.port or 80
+        if scheme == "https":
+            conn: http.client.HTTPConnection = ResumableHTTPSConnection(
+                connect_host,
+                connect_port,
+                self.tls_sessions,
+                timeout=self.connect_timeout,
+                context=self.ssl_context,
+            )
+            if proxy:
+                conn.set_tunnel(host, port, headers=proxy_headers(proxy))
+        else:
+            conn = http.client.HTTPConnection(connect_host, connect_port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _acquire(self, pool_key: Tuple[str, str, int, str]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self.lock:
+            idle = self.idle.get(pool_key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(*pool_key), False
+
+    def _release(self, pool_key: Tuple[str, str, int, str], conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            idle = self.idle.setdefault(pool_key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(
+        self,
+        pool_key: Tuple[str, str, int, str],
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        read_timeout: Optional[float],
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        while True:
+            conn, reused = self._acquire(pool_key)
+            conn.sock.settimeout(read_timeout or self.read_timeout)
+            try:
+                payload = body() if callable(body) else body
+                conn.request(method, target, body=payload, headers=headers)
+                return conn, conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                METRICS.inc("http_stale_retries_total", host=pool_key[1])
+            except Exception:
+                conn.close()
+                raise
+
+    @contextlib.contextmanager
+    def open(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: RequestBody = None,
+        read_timeout: Optional[float] = None,
+        max_redirects: int = 5,
+    ) -> Iterator[http.client.HTTPResponse]:
+        request_headers = dict(headers or {})
+        if not any(name.lower() == "user-agent" for name in request_headers):
+            request_headers["User-Agent"] = DEFAULT_USER_AGENT
+        host = urllib.parse.urlparse(url).hostname or ""
+        sent = len(body) if isinstance(body, bytes) else int(request_headers.get("Content-Length", 0) or 0)
+        with METRICS.span("http_request", method=method, host=host) as span:
+            span["status"] = "error"
+            for _ in range(max_redirects + 1):
+                parsed = urllib.parse.urlparse(url)
+                scheme = parsed.scheme.lower()
+                if scheme not in {"http", "https"}:
+                    raise ValueError(f"Unsupported URL scheme: {url}")
+                port = parsed.port or (443 if scheme == "https" else 80)
+                proxy = proxy_for(scheme, parsed.hostname or "")
+                pool_key = (scheme, parsed.hostname or "", port, proxy)
+                target = parsed.path or "/"
+                if parsed.query:
+                    target += f"?{parsed.query}"
+                send_headers = request_headers
+                if proxy and scheme == "http":
+                    target = f"http://{parsed.netloc.rpartition('@')[2]}{target}"
+                    send_headers = {**request_headers, **proxy_headers(proxy)}
+
+                conn, response = self._send(pool_key, method, target, send_headers, body, read_timeout)
+                METRICS.inc("http_sent_bytes_total", sent, host=host)
+                location = response.getheader("Location")
+                if response.status in REDIRECT_STATUSES and location and method in {"GET", "HEAD"}:
+                    response.read()
+                    self._finish(pool_key, conn, response)
+                    url = urllib.parse.urljoin(url, location)
+                    continue
+
+                span["status"] = str(response.status)
+                METRICS.inc("http_requests_total", method=method, host=host, status=response.status)
+                try:
+                    yield response
+                finally:
+                    self._finish(pool_key, conn, response)
+                return
+
+            raise RuntimeError(f"Too many redirects: {url}")
+
+    def _finish(
+        self,
+        pool_key: Tuple[str, str, int, str],
+        conn: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+    ) -> None:
+        if response.isclosed() and not response.will_close:
+            self._release(pool_key, conn)
+        else:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: RequestBody = None,
+        read_timeout: Optional[float] = None,
+    ) -> Tuple[int, bytes]:
+        with self.open(method, url, headers, body, read_timeout) as response:
+            raw = response.read()
+        METRICS.inc("http_received_bytes_total", len(raw), host=urllib.parse.urlparse(url).hostname or "")
+        return response.status, raw
+
+    def close(self) -> None:
+        with self.lock:
+            pools = list(self.idle.values())
+            self.idle = {}
+        for pool in pools:
+            for conn in pool:
+                conn.close()
+
+
+HTTP_CLIENT = HttpClient()
+
+
+class HttpStatusError(RuntimeError):
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_transient_error(error: BaseException) -> bool:
+    if isinstance(error, HttpStatusError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (OSError, http.client.HTTPException, CircuitOpenError))
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, threshold: int, cooldown_seconds: float) -> None:
+        self.host = host
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> None:
+        with self.lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            retry_in = self.opened_at + self.cooldown_seconds - now
+            # Half-open: after the cooldown, let one probe through; a probe that never reports expires.
+            if retry_in <= 0 and (self.probe_at is None or now - self.probe_at >= self.cooldown_seconds):
+                self.probe_at = now
+                return
+        METRICS.inc("circuit_rejections_total", host=self.host)
+        raise CircuitOpenError(self.host, max(retry_in, 0.0) or self.cooldown_seconds)
+
+    def record(self, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                self.probe_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    METRICS.inc("circuit_opens_total", host=self.host)
+                self.opened_at = time.monotonic()
+                self.probe_at = None
+
+
+class Resilience:
+    def __init__(
+        self,
+        deadline_seconds: float = 60.0,
+        download_deadline_seconds: float = 600.0,
+        max_retries: int = 3,
+        hedge: bool = True,
+        breaker_threshold: int = 5,
+        breaker_cooldown_seconds: float = 30.0,
+    ) -> None:
+        self.deadline_seconds = deadline_seconds
+        self.download_deadline_seconds = download_deadline_seconds
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.requests = 0
+        self.hedges = 0
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, self.breaker_threshold, self.breaker_cooldown_seconds)
+                self.breakers[host] = breaker
+            return breaker
+
+    def backoff(self, attempt: int, deadline: float, retry_after: Optional[float] = None) -> None:
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+
+    def call(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: RequestBody = None,
+    ) -> Tuple[int, bytes]:
+        idempotent = method in {"GET", "HEAD"}
+        retry_statuses = RETRY_STATUSES if idempotent else UNSENT_RETRY_STATUSES
+        host = urllib.parse.urlparse(url).hostname or ""
+        breaker = self.breaker(host)
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Deadline of {self.deadline_seconds}s exceeded: {method} {url}")
+            try:
+                breaker.allow()
+            except CircuitOpenError as error:
+                # The poll loop reschedules status checks itself; other calls wait out the cooldown.
+                if idempotent or attempt > self.max_retries or error.retry_in >= remaining:
+                    raise
+                time.sleep(error.retry_in)
+                continue
+            retry_after = None
+            try:
+                if idempotent and self.hedge:
+                    status, raw, retry_after = self._hedged(method, url, headers, deadline)
+                else:
+                    status, raw, retry_after = self._attempt(method, url, headers, body, remaining)
+            except (OSError, http.client.HTTPException):
+                breaker.record(False)
+                if not idempotent or attempt > self.max_retries:
+                    raise
+            else:
+                breaker.record(status not in RETRY_STATUSES)
+                if status not in retry_statuses or attempt > self.max_retries:
+                    return status, raw
+            METRICS.inc("http_retries_total", host=host)
+            self.backoff(attempt, deadline, retry_after)
+
+    def _attempt(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        body: RequestBody,
+        remaining: float,
+    ) -> Tuple[int, bytes, Optional[float]]:
+        read_timeout = max(0.1, min(HTTP_CLIENT.read_timeout, remaining))
+        with HTTP_CLIENT.open(method, url, headers, body, read_timeout) as response:
+            raw = response.read()
+            retry_after = retry_after_seconds(response.getheader("Retry-After"))
+        METRICS.inc("http_received_bytes_total", len(raw), host=urllib.parse.urlparse(url).hostname or "")
+        return response.status, raw, retry_after
+
+    def record_latency(self, route: str, seconds: float) -> None:
+        with self.lock:
+            samples = self.latencies.setdefault(route, [])
+            samples.append(seconds)
+            del samples[:-HEDGE_LATENCY_WINDOW]
+
+    def _timed_attempt(
+        self,
+        route: str,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        remaining: float,
+    ) -> Tuple[int, bytes, Optional[float]]:
+        started = time.monotonic()
+        result = self._attempt(method, url, headers, None, remaining)
+        if result[0] < 500:
+            self.record_latency(route, time.monotonic() - started)
+        return result
+
+    def hedge_delay(self, route: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self.lock:
+            samples = sorted(self.latencies.get(route, []))
+            self.requests += 1
+            if len(samples) < HEDGE_MIN_SAMPLES or self.hedges >= max(1, self.requests * HEDGE_MAX_RATIO):
+                return None
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return samples[min(len(samples) - 1, int(len(samples) * HEDGE_QUANTILE))]
+
+    def race(
+        self,
+        host: str,
+        primary: Callable[[], Any],
+        backup: Callable[[], Any],
+        delay: float,
+        deadline: float,
+        accept: Callable[[Any], bool] = lambda result: True,
+    ) -> Tuple[Any, Optional[Future]]:
+        # A call slower than its route's p95 gets a duplicate; whichever answers first wins.
+        first = self.executor.submit(primary)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result(), None
+        with self.lock:
+            self.hedges += 1
+        METRICS.inc("http_hedges_total", host=host)
+        second = self.executor.submit(backup)
+        pending = {first, second}
+        fallback: Optional[Future] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"Deadline exceeded while hedging a call to {host}")
+            for future in done:
+                if future.exception() is None and accept(future.result()):
+                    if future is second:
+                        METRICS.inc("http_hedge_wins_total", host=host)
+                    loser = second if future is first else first
+                    return future.result(), None if loser.done() else loser
+                fallback = fallback or future
+        return fallback.result(), None
+
+    def _hedged(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        deadline: float,
+    ) -> Tuple[int, bytes, Optional[float]]:
+        parsed = urllib.parse.urlparse(url)
+        route = f"{method} {parsed.hostname}{parsed.path}"
+        delay = self.hedge_delay(route)
+        remaining = deadline - time.monotonic()
+        if delay is None or delay >= remaining:
+            return self._timed_attempt(route, method, url, headers, remaining)
+
+        def attempt() -> Tuple[int, bytes, Optional[float]]:
+            return self._timed_attempt(route, method, url, headers, deadline - time.monotonic())
+
+        result, _ = self.race(
+            parsed.hostname or "", attempt, attempt, delay, deadline, lambda result: result[0] not in RETRY_STATUSES
+        )
+        return result
+
+
+RESILIENCE = Resilience()
+
+
+class CallbackRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        return
+
+    def do_POST(self) -> None:
+        receiver: "CallbackReceiver" = self.server.receiver
+        parsed = urllib.parse.urlparse(self.path)
+        token = urllib.parse.parse_qs(parsed.query).get("token", [""])[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if parsed.path != CALLBACK_PATH or not secrets.compare_digest(token, receiver.token):
+            self.send_error(404)
+            return
+
+        try:
+            payload = json.loads(raw.decode("utf-8")) if raw else {}
+        except ValueError:
+            self.send_error(400, "Invalid JSON body")
+            return
+
+        data = payload.get("data") if isinstance(payload, dict) else None
+        task_id = data.get("taskId") if isinstance(data, dict) else None
+        if not isinstance(task_id, str) or not task_id:
+            self.send_error(400, "Missing taskId in callback payload")
+            return
+
+        receiver.events.put((task_id, payload))
+        body = b'{"code":200}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CallbackReceiver:
+    def __init__(self, host: str, port: int, public_url: str = "") -> None:
+        self.token = secrets.token_urlsafe(16)
+        self.events: "queue.Queue[Tuple[str, Dict]]" = queue.Queue()
+        self.pending: List[Tuple[str, Dict]] = []
+        self.server = ThreadingHTTPServer((host, port), CallbackRequestHandler)
+        self.server.receiver = self
+        bound_host, bound_port = self.server.server_address[:2]
+        base_url = public_url.rstrip("/") if public_url else f"http://{bound_host}:{bound_port}"
+        self.url = f"{base_url}{CALLBACK_PATH}?token={self.token}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "CallbackReceiver":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait(self, timeout: Optional[float]) -> None:
+        try:
+            self.pending.append(self.events.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+    def drain(self) -> List[Tuple[str, Dict]]:
+        events, self.pending = self.pending, []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
 def request_json(url: str, headers: Dict[str, str], method: str, body: Optional[Dict] = None) -> Dict:
     data = None
     if body is not None:
         data = json.dumps(body).encode("utf-8")
 
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
-    try:
-        with urllib.request.urlopen(req) as response:
-            raw = response.read().decode("utf-8")
-            if response.status < 200 or response.status >= 300:
-                raise RuntimeError(f"Request failed: {response.status}, body: {raw}")
-            return json.loads(raw) if raw else {}
-    except urllib.error.HTTPError as exc:
-        body_text = exc.read().decode("utf-8", errors="replace")
-        raise RuntimeError(f"Request failed: {exc.code}, body: {body_text}") from exc
+    status, raw_bytes = RESILIENCE.call(method, url, headers, data)
+    raw = raw_bytes.decode("utf-8", errors="replace")
+    if status < 200 or status >= 300:
+        raise HttpStatusError(status, f"Request failed: {status}, body: {raw}")
+    return json.loads(raw) if raw else {}
 
 
-def submit_payload(provider: str, api_base: str, headers: Dict[str, str], payload: Dict) -> Dict:
+def submit_payload(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    payload: Dict,
+    callback_url: str = "",
+) -> Dict:
+    with METRICS.span("submit_payload", provider=provider):
+        return _submit_payload(provider, api_base, headers, payload, callback_url)
+
+
+def _submit_payload(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    payload: Dict,
+    callback_url: str,
+) -> Dict:
     if provider == "kie":
         body = {
             "model": payload.get("model_uuid", ""),
@@ -621,6 +1505,8 @@ def submit_payload(provider: str, api_base: str, headers: Dict[str, str], payloa
                 "aspect_ratio": payload.get("aspect_ratio", "3:4"),
             },
         }
+        if callback_url:
+            body["callBackUrl"] = callback_url
         reference_image_urls = payload.get("reference_image_urls")
         if isinstance(reference_image_urls, list) and reference_image_urls:
             body["input"]["image_urls"] = reference_image_urls
@@ -630,6 +1516,324 @@ def submit_payload(provider: str, api_base: str, headers: Dict[str, str], payloa
     return request_json(endpoint, headers, "POST", payload)
 
 
+class ModelSlots:
+    # Tasks in flight per model, held from create until the task settles; keys are task indexes.
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active: Dict[str, int] = {}
+        self.holders: Dict[int, str] = {}
+        self.closed = False
+        self.changed = threading.Condition()
+
+    def try_take(self, key: int, model_uuid: str) -> bool:
+        with self.changed:
+            if self.closed:
+                raise RuntimeError("Model slots closed while tasks were still being submitted")
+            if self.limit >= 1 and self.active.get(model_uuid, 0) >= self.limit:
+                return False
+            self.active[model_uuid] = self.active.get(model_uuid, 0) + 1
+            self.holders[key] = model_uuid
+            return True
+
+    def take(self, key: int, model_uuid: str) -> None:
+        with self.changed:
+            while not self.try_take(key, model_uuid):
+                self.changed.wait()
+
+    def wait(self, timeout: float) -> None:
+        with self.changed:
+            self.changed.wait(timeout)
+
+    def release(self, key: int) -> None:
+        with self.changed:
+            model_uuid = self.holders.pop(key, None)
+            if model_uuid is None:
+                return
+            self.active[model_uuid] -= 1
+            self.changed.notify_all()
+
+    def close(self) -> None:
+        with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+
+
+class TaskBudget:
+    # Host-wide semaphore: a task holds an flock on one of `limit` slot files from create until it settles.
+    # Waiters queue as lock-held ticket files named by arrival time, so invocations are served first come,
+    # first served, and a crashed process frees its slots and tickets with its file descriptors.
+    def __init__(self, directory: str, limit: int) -> None:
+        if fcntl is None:
+            raise RuntimeError("task_budget requires POSIX file locks, which this platform does not provide")
+        self.directory = directory
+        self.queue_dir = os.path.join(directory, "queue")
+        os.makedirs(self.queue_dir, exist_ok=True)
+        self.limit = limit
+        self.held: Dict[int, int] = {}
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def _enqueue(self) -> Tuple[str, int]:
+        name = f"{time.time_ns():020d}-{os.getpid()}-{secrets.token_hex(4)}"
+        staging = os.path.join(self.directory, f"{name}.new")
+        ticket = os.open(staging, os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(ticket, fcntl.LOCK_EX)
+        # Only publish the ticket once it is locked, so no scanner can mistake it for a stale one.
+        os.replace(staging, os.path.join(self.queue_dir, name))
+        return name, ticket
+
+    def _is_head(self, name: str) -> bool:
+        for other in sorted(os.listdir(self.queue_dir)):
+            if other == name:
+                return True
+            path = os.path.join(self.queue_dir, other)
+            try:
+                ticket = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(ticket, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            else:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            finally:
+                os.close(ticket)
+        return False
+
+    def _try_slot(self) -> Optional[int]:
+        for slot in range(self.limit):
+            handle = os.open(os.path.join(self.directory, f"slot-{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except BlockingIOError:
+                os.close(handle)
+        return None
+
+    def acquire(self, key: int) -> None:
+        waited = time.monotonic()
+        name, ticket = self._enqueue()
+        try:
+            while True:
+                if self.closed:
+                    raise RuntimeError("Task budget closed while waiting for a slot")
+                if self._is_head(name):
+                    handle = self._try_slot()
+                    if handle is not None:
+                        break
+                time.sleep(TASK_BUDGET_POLL_SECONDS)
+        finally:
+            os.remove(os.path.join(self.queue_dir, name))
+            os.close(ticket)
+        with self.lock:
+            self.held[key] = handle
+        METRICS.observe("task_budget_wait_seconds", time.monotonic() - waited)
+
+    def release(self, key: int) -> None:
+        with self.lock:
+            handle = self.held.pop(key, None)
+        if handle is not None:
+            os.close(handle)
+
+    def close(self) -> None:
+        self.closed = True
+        with self.lock:
+            handles, self.held = list(self.held.values()), {}
+        for handle in handles:
+            os.close(handle)
+
+
+def open_task_budget(args: argparse.Namespace, headers: Dict[str, str]) -> Optional[TaskBudget]:
+    if args.task_budget < 1:
+        return None
+    account = json.dumps([args.provider, args.api_base, headers.get("Authorization", "")])
+    digest = hashlib.sha256(account.encode("utf-8")).hexdigest()[:16]
+    return TaskBudget(os.path.join(args.task_budget_dir, f"{args.provider}-{digest}"), args.task_budget)
+
+
+class TaskArrivals:
+    # Hands generation IDs from a background submitter to the poller; an empty ID marks a failed create.
+    def __init__(self) -> None:
+        self.items: List[Tuple[int, str]] = []
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+
+    def put(self, index: int, generation_uuid: str) -> None:
+        with self.lock:
+            self.items.append((index, generation_uuid))
+
+    def close(self, error: Optional[BaseException]) -> None:
+        with self.lock:
+            self.error = error
+
+    def drain(self) -> List[Tuple[int, str]]:
+        with self.lock:
+            if self.error is not None:
+                raise self.error
+            items, self.items = self.items, []
+        return items
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: int) -> None:
+        self.rate_per_second = rate_per_second
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+def submit_all(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    payloads: List[Dict],
+    concurrency: int,
+    limiter: TokenBucket,
+    callback_url: str = "",
+    on_response: Optional[Callable[[int, Dict], None]] = None,
+    model_slots: Optional[ModelSlots] = None,
+    before_submit: Optional[Callable[[int], None]] = None,
+    task_indexes: Optional[List[int]] = None,
+) -> List[Dict]:
+    # With model_slots, a slot is taken per task before its create call and left held: whoever settles
+    # the task (or sees its create fail) releases it by task index.
+    def submit_one(position: int) -> Dict:
+        if before_submit is not None:
+            before_submit(position)
+        waited = time.monotonic()
+        limiter.acquire()
+        METRICS.observe("submit_rate_wait_seconds", time.monotonic() - waited)
+        response = submit_payload(provider, api_base, headers, payloads[position], callback_url)
+        if on_response is not None:
+            # Whatever on_response returns is kept in place of the raw response.
+            return on_response(position, response)
+        return response
+
+    if model_slots is None:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(submit_one, range(len(payloads))))
+
+    indexes = task_indexes or list(range(1, len(payloads) + 1))
+    queues: Dict[str, List[int]] = {}
+    for position, payload in enumerate(payloads):
+        queues.setdefault(payload.get("model_uuid", ""), []).append(position)
+    for positions in queues.values():
+        positions.reverse()
+    responses: List[Dict] = [{} for _ in payloads]
+    in_flight: Dict[Future, int] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while queues or in_flight:
+            # Round-robin across models so one model's backlog never starves the others.
+            dispatched = True
+            while dispatched and len(in_flight) < concurrency:
+                dispatched = False
+                for model_uuid in list(queues):
+                    if len(in_flight) >= concurrency:
+                        break
+                    if not model_slots.try_take(indexes[queues[model_uuid][-1]], model_uuid):
+                        continue
+                    position = queues[model_uuid].pop()
+                    if not queues[model_uuid]:
+                        del queues[model_uuid]
+                    in_flight[executor.submit(submit_one, position)] = position
+                    dispatched = True
+
+            if not in_flight:
+                # Every remaining model is at its cap until one of its tasks settles.
+                model_slots.wait(CALLBACK_WAKE_SECONDS)
+                continue
+            done, _ = wait(list(in_flight), timeout=CALLBACK_WAKE_SECONDS if queues else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                responses[in_flight.pop(future)] = future.result()
+    return responses
+
+
+def submit_pending(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    payloads: List[Dict],
+    concurrency: int,
+    limiter: TokenBucket,
+    callback_url: str = "",
+    journal: Optional["CheckpointJournal"] = None,
+    skip_positions: Optional[set] = None,
+    model_slots: Optional[ModelSlots] = None,
+    raw_log: Optional["RawResponseLog"] = None,
+    budget: Optional[TaskBudget] = None,
+    on_created: Optional[Callable[[int, Dict], None]] = None,
+    keep_responses: bool = False,
+) -> List[Dict]:
+    # Returns one {"generation_uuid"[, "create_error"][, "create_response"]} per payload ({} for skipped ones);
+    # the full create response is only kept with keep_responses, and only journaled for --debug-raw inline.
+    state = journal.replay() if journal is not None else {}
+    skipped = skip_positions or set()
+    created: List[Optional[Dict]] = [
+        {} if position in skipped else restored_task(provider, state.get(position + 1, {}).get("submit"))
+        for position in range(len(payloads))
+    ]
+    missing = [position for position, task in enumerate(created) if task is None]
+    if on_created is not None:
+        for position, task in enumerate(created):
+            if task is None or position in skipped:
+                continue
+            if task.get("generation_uuid") and settled_result(state.get(position + 1, {})) is None:
+                # A resumed task is still running at the provider, so it holds slots until it settles like a new one.
+                if model_slots is not None:
+                    model_slots.take(position + 1, payloads[position].get("model_uuid", ""))
+                if budget is not None:
+                    budget.acquire(position + 1)
+            on_created(position, task)
+
+    def reserve(position: int) -> None:
+        if budget is not None:
+            budget.acquire(missing[position] + 1)
+
+    def record(position: int, response: Dict) -> Dict:
+        index = missing[position] + 1
+        task = created_task(provider, response)
+        raw = raw_log.record("create", index, response) if raw_log is not None else None
+        if journal is not None:
+            journal.append("submit", index=index, **task, **({"create_response": raw} if raw is not None else {}))
+        if keep_responses:
+            task["create_response"] = response
+        if on_created is not None:
+            on_created(missing[position], task)
+        return task
+
+    fresh = submit_all(
+        provider,
+        api_base,
+        headers,
+        [payloads[position] for position in missing],
+        concurrency=concurrency,
+        limiter=limiter,
+        callback_url=callback_url,
+        on_response=record,
+        model_slots=model_slots,
+        before_submit=reserve,
+        task_indexes=[position + 1 for position in missing],
+    )
+    for position, task in zip(missing, fresh):
+        created[position] = task
+    return [task or {} for task in created]
+
+
 def extract_generation_uuid(provider: str, response: Dict) -> str:
     if provider == "kie":
         data = response.get("data") if isinstance(response, dict) else None
@@ -648,15 +1852,31 @@ def extract_generation_uuid(provider: str, response: Dict) -> str:
     raise RuntimeError(f"Missing generation_uuid in create-task response: {response}")
 
 
+def created_task(provider: str, response: Dict) -> Dict:
+    try:
+        return {"generation_uuid": extract_generation_uuid(provider, response)}
+    except RuntimeError as error:
+        return {"generation_uuid": "", "create_error": str(error)}
+
+
+def restored_task(provider: str, event: Optional[Dict]) -> Optional[Dict]:
+    if event is None:
+        return None
+    if "generation_uuid" not in event:
+        # Journals written before submit events were compacted carry the whole create response.
+        return created_task(provider, event.get("create_response") or {})
+    return {key: event[key] for key in ["generation_uuid", "create_error", "create_response"] if key in event}
+
+
 def fetch_status(provider: str, api_base: str, headers: Dict[str, str], generation_uuid: str) -> Dict:
     if provider == "kie":
         query = urllib.parse.urlencode({"taskId": generation_uuid})
         endpoint = f"{KIE_QUERY_TASK_URL}?{query}"
+    else:
+        endpoint = api_base.rstrip("/") + f"/api/generation/status/{generation_uuid}"
+    with METRICS.span("fetch_status", provider=provider):
         return request_json(endpoint, headers, "GET", None)
 
-    endpoint = api_base.rstrip("/") + f"/api/generation/status/{generation_uuid}"
-    return request_json(endpoint, headers, "GET", None)
-
 
 def extract_status_and_urls(provider: str, status_response: Dict) -> Tuple[str, List[str], str]:
     if provider == "kie":
@@ -727,6 +1947,33 @@ def extract_status_and_urls(provider: str, status_response: Dict) -> Tuple[str,
     return status.lower(), urls, error_message
 
 
+def evaluate_poll(
+    provider: str,
+    status_response: Dict,
+    elapsed_seconds: float,
+    timeout_seconds: int,
+) -> Optional[Dict]:
+    status, urls, error_message = extract_status_and_urls(provider, status_response)
+
+    if status in {"completed", "failed"}:
+        return {
+            "status": status,
+            "urls": urls,
+            "error_message": error_message,
+            "raw": status_response,
+        }
+
+    if elapsed_seconds >= timeout_seconds:
+        return {
+            "status": "timeout",
+            "urls": urls,
+            "error_message": f"Polling timed out after {timeout_seconds} seconds",
+            "raw": status_response,
+        }
+
+    return None
+
+
 def poll_until_done(
     provider: str,
     api_base: str,
@@ -738,41 +1985,396 @@ def poll_until_done(
     start = time.time()
     while True:
         status_response = fetch_status(provider, api_base, headers, generation_uuid)
-        status, urls, error_message = extract_status_and_urls(provider, status_response)
+        result = evaluate_poll(provider, status_response, time.time() - start, timeout_seconds)
+        if result is not None:
+            return result
 
-        if status == "completed":
-            return {
-                "status": status,
-                "urls": urls,
-                "error_message": error_message,
-                "raw": status_response,
-            }
+        time.sleep(interval_seconds)
 
-        if status == "failed":
-            return {
-                "status": status,
-                "urls": urls,
-                "error_message": error_message,
-                "raw": status_response,
-            }
 
-        elapsed = time.time() - start
-        if elapsed >= timeout_seconds:
-            return {
+def poll_history_key(model_uuid: str, style_key: str) -> str:
+    return f"{model_uuid}:{STYLE_CATEGORY_MAP.get(style_key, 'fine-detail')}"
+
+
+def load_poll_history(path: str) -> Dict[str, List[float]]:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            history = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return history if isinstance(history, dict) else {}
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    # Serializes read-modify-write of a shared file across processes; a no-op where flock is unavailable.
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handle = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(handle)
+
+
+def write_json_atomic(path: str, data: Any, indent: Optional[int] = None) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, indent=indent)
+    os.replace(temp_path, path)
+
+
+def save_poll_history(path: str, samples: Dict[str, List[float]]) -> None:
+    # Merges this run's new samples into the file on disk, so concurrent runs don't drop each other's.
+    if not path or not samples:
+        return
+    with file_lock(path):
+        history = load_poll_history(path)
+        for key, values in samples.items():
+            merged = [value for value in history.get(key, []) if isinstance(value, (int, float))] + values
+            history[key] = merged[-POLL_HISTORY_LIMIT:]
+        write_json_atomic(path, history, indent=2)
+
+
+def expected_poll_seconds(history: Dict[str, List[float]], key: str) -> Optional[float]:
+    samples = sorted(value for value in history.get(key, []) if isinstance(value, (int, float)) and value > 0)
+    if not samples:
+        return None
+    return float(samples[len(samples) // 2])
+
+
+def next_poll_delay(
+    elapsed_seconds: float,
+    expected_seconds: Optional[float],
+    interval_seconds: float,
+    min_interval_seconds: float,
+    max_interval_seconds: float,
+) -> float:
+    if expected_seconds is None:
+        delay = interval_seconds
+    elif elapsed_seconds < expected_seconds * 0.75:
+        # Sparse phase: close half the distance to the start of the expected finish window.
+        delay = max(interval_seconds, (expected_seconds * 0.85 - elapsed_seconds) / 2)
+    elif elapsed_seconds < expected_seconds * 1.5:
+        delay = min_interval_seconds
+    else:
+        delay = interval_seconds * elapsed_seconds / expected_seconds
+
+    delay = min(max(delay, min_interval_seconds), max_interval_seconds)
+    return delay * random.uniform(0.85, 1.15)
+
+
+def iter_poll_results(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    generation_uuids: List[str],
+    timeout_seconds: int,
+    interval_seconds: int,
+    concurrency: int,
+    expected_seconds: Optional[List[Optional[float]]] = None,
+    min_interval_seconds: float = 2,
+    max_interval_seconds: float = 30,
+    callbacks: Optional[CallbackReceiver] = None,
+    fallback_interval_seconds: float = 60,
+    arrivals: Optional[Callable[[], List[Tuple[int, str]]]] = None,
+) -> Iterator[Tuple[int, Dict]]:
+    # With `arrivals`, tasks whose generation ID is still empty are being created elsewhere; the callable
+    # yields (index, generation_uuid) as they come in, and each task's poll clock starts at its arrival.
+    generation_uuids = list(generation_uuids)
+    expected = expected_seconds or [None] * len(generation_uuids)
+    index_by_uuid = {generation_uuid: index for index, generation_uuid in enumerate(generation_uuids) if generation_uuid}
+    awaiting = sum(1 for generation_uuid in generation_uuids if not generation_uuid) if arrivals is not None else 0
+
+    def delay_for(index: int, elapsed: float) -> float:
+        if callbacks is not None:
+            delay = fallback_interval_seconds * random.uniform(0.85, 1.15)
+        else:
+            delay = next_poll_delay(elapsed, expected[index], interval_seconds, min_interval_seconds, max_interval_seconds)
+        return min(delay, max(0.0, timeout_seconds - elapsed))
+
+    start = time.time()
+    started = [start] * len(generation_uuids)
+    due: List[Tuple[float, int]] = [
+        (start + delay_for(index, 0), index) for index, generation_uuid in enumerate(generation_uuids) if generation_uuid
+    ]
+    heapq.heapify(due)
+    in_flight: Dict[Future, int] = {}
+    poll_counts = [0] * len(generation_uuids)
+    finished: set = set()
+    # A callback can beat its task's arrival; it is held here and settles the task once the ID registers.
+    early_callbacks: Dict[str, Dict] = {}
+
+    def settle(index: int, status_response: Dict, error: Optional[BaseException] = None) -> Optional[Dict]:
+        elapsed = time.time() - started[index]
+        if error is None:
+            result = evaluate_poll(provider, status_response, elapsed, timeout_seconds)
+        elif elapsed >= timeout_seconds:
+            result = {
                 "status": "timeout",
-                "urls": urls,
-                "error_message": f"Polling timed out after {timeout_seconds} seconds",
-                "raw": status_response,
+                "urls": [],
+                "error_message": f"Polling timed out after {timeout_seconds} seconds, last error: {error}",
+                "raw": None,
             }
+        else:
+            result = None
+        if result is None:
+            return None
+        finished.add(index)
+        result["elapsed_seconds"] = round(elapsed, 2)
+        result["poll_count"] = poll_counts[index]
+        METRICS.observe("polls_per_task", poll_counts[index], provider=provider)
+        METRICS.observe("task_poll_seconds", elapsed, provider=provider, status=result["status"])
+        METRICS.inc("tasks_total", provider=provider, status=result["status"])
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while len(finished) < len(generation_uuids):
+            if awaiting:
+                for index, generation_uuid in arrivals():
+                    awaiting -= 1
+                    if not generation_uuid:
+                        finished.add(index)
+                        continue
+                    generation_uuids[index] = generation_uuid
+                    index_by_uuid[generation_uuid] = index
+                    started[index] = time.time()
+                    heapq.heappush(due, (started[index] + delay_for(index, 0), index))
+                    payload = early_callbacks.pop(generation_uuid, None)
+                    if payload is not None:
+                        result = settle(index, payload)
+                        if result is not None:
+                            yield index, result
+                if len(finished) >= len(generation_uuids):
+                    break
 
-        time.sleep(interval_seconds)
+            if callbacks is not None:
+                for generation_uuid, payload in callbacks.drain():
+                    index = index_by_uuid.get(generation_uuid)
+                    if index is None and awaiting:
+                        early_callbacks[generation_uuid] = payload
+                        continue
+                    if index is None or index in finished:
+                        continue
+                    result = settle(index, payload)
+                    if result is not None:
+                        yield index, result
+                if len(finished) >= len(generation_uuids):
+                    break
+
+            now = time.time()
+            while due and due[0][0] <= now and len(in_flight) < concurrency:
+                _, index = heapq.heappop(due)
+                if index in finished:
+                    continue
+                future = executor.submit(fetch_status, provider, api_base, headers, generation_uuids[index])
+                in_flight[future] = index
+                poll_counts[index] += 1
+
+            wait_seconds = None
+            if due and len(in_flight) < concurrency:
+                wait_seconds = max(0.0, due[0][0] - time.time())
+            if awaiting:
+                wait_seconds = CALLBACK_WAKE_SECONDS if wait_seconds is None else min(wait_seconds, CALLBACK_WAKE_SECONDS)
+
+            if not in_flight:
+                if callbacks is not None:
+                    callbacks.wait(wait_seconds)
+                else:
+                    time.sleep(wait_seconds or 0)
+                continue
+
+            if callbacks is not None:
+                wait_seconds = CALLBACK_WAKE_SECONDS if wait_seconds is None else min(wait_seconds, CALLBACK_WAKE_SECONDS)
+
+            done, _ = wait(list(in_flight), timeout=wait_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                error = future.exception()
+                if error is not None and not is_transient_error(error):
+                    raise error
+                if error is not None:
+                    METRICS.inc("poll_errors_total", provider=provider)
+                if index in finished:
+                    continue
+                result = settle(index, {} if error is not None else future.result(), error)
+                if result is None:
+                    # An open circuit sheds load: wait out the cooldown instead of polling into it.
+                    delay = max(delay_for(index, time.time() - started[index]), getattr(error, "retry_in", 0.0))
+                    heapq.heappush(due, (time.time() + delay, index))
+                else:
+                    yield index, result
+
+
+def download_task_files(output_dir: str, task_index: int, style_key: str, urls: List[str]) -> List[Dict]:
+    files = []
+    for image_index, image_url in enumerate(urls, start=1):
+        ext = infer_extension(image_url)
+        filename = f"{task_index:02d}-{slugify(style_key)}-{image_index:02d}{ext}"
+        file_path = os.path.join(output_dir, filename)
+        download_file(image_url, file_path)
+        files.append(
+            {
+                "source_url": image_url,
+                "local_path": file_path,
+                "sha256": file_sha256(file_path),
+            }
+        )
+    return files
+
+
+def report_progress(done: int, total: int, style_key: str, status: str, detail: str = "") -> None:
+    line = f"[{done}/{total}] {style_key}: {status}"
+    if detail:
+        line += f" ({detail})"
+    print(line, file=sys.stderr, flush=True)
+
+
+def collect_streaming(
+    provider: str,
+    api_base: str,
+    headers: Dict[str, str],
+    tasks: List[Dict],
+    output_dir: str,
+    timeout_seconds: int,
+    interval_seconds: int,
+    poll_concurrency: int,
+    download_concurrency: int,
+    progress: Optional[Callable[[int, int, str, str, str], None]] = report_progress,
+    model_uuid: str = "",
+    poll_history_path: str = "",
+    min_interval_seconds: float = 2,
+    max_interval_seconds: float = 30,
+    callbacks: Optional[CallbackReceiver] = None,
+    fallback_interval_seconds: float = 60,
+    journal: Optional["CheckpointJournal"] = None,
+    on_result: Optional[Callable[[int, Dict], None]] = None,
+    model_slots: Optional[ModelSlots] = None,
+    raw_log: Optional["RawResponseLog"] = None,
+    arrivals: Optional[TaskArrivals] = None,
+    budget: Optional[TaskBudget] = None,
+) -> List[Dict]:
+    # tasks: [{"index", "style_key", "generation_uuid"}], optionally with "model_uuid", "output_dir" and
+    # "file_index" for fan-out runs; results come back in the same order. With `arrivals`, an empty
+    # generation_uuid is filled in once the task is created; budget and model slots are released as each task settles.
+    results: List[Dict] = [{} for _ in tasks]
+    history = load_poll_history(poll_history_path)
+    fresh_samples: Dict[str, List[float]] = {}
+    state = journal.replay() if journal is not None else {}
+    total = len(tasks)
+    finished = 0
+    lock = threading.Lock()
+
+    def finish(position: int, status: str, detail: str = "") -> None:
+        nonlocal finished
+        with lock:
+            finished += 1
+            if progress:
+                progress(finished, total, tasks[position]["style_key"], status, detail)
+        if on_result:
+            on_result(tasks[position]["index"], results[position])
+
+    def on_downloaded(position: int, future: Future) -> None:
+        if future.exception() is not None:
+            # One bad file fails its own task only; the run still finishes and writes its manifest.
+            error_message = str(future.exception())
+            results[position] = dict(results[position], status="download_failed", error_message=error_message)
+            finish(position, "download_failed", error_message)
+            return
+        results[position]["files"] = future.result()
+        if journal is not None:
+            journal.append("download", index=tasks[position]["index"], files=results[position]["files"])
+        finish(position, "downloaded", f"{len(results[position]['files'])} file(s)")
+
+    pending: List[int] = []
+    for position, task in enumerate(tasks):
+        settled = settled_result(state.get(task["index"], {}))
+        if settled is None:
+            pending.append(position)
+        else:
+            results[position] = settled
+            finish(position, "resumed", settled["status"])
+
+    task_models = [tasks[position].get("model_uuid", model_uuid) for position in pending]
+    history_keys = [
+        poll_history_key(task_model, tasks[position]["style_key"])
+        for task_model, position in zip(task_models, pending)
+    ]
+    pending_by_index = {tasks[position]["index"]: pending_index for pending_index, position in enumerate(pending)}
+
+    def drain_arrivals() -> List[Tuple[int, str]]:
+        return [
+            (pending_by_index[index], generation_uuid)
+            for index, generation_uuid in arrivals.drain()
+            if index in pending_by_index
+        ]
+
+    with ThreadPoolExecutor(max_workers=download_concurrency) as download_executor:
+        for pending_index, result in iter_poll_results(
+            provider,
+            api_base,
+            headers,
+            [tasks[position]["generation_uuid"] for position in pending],
+            timeout_seconds=timeout_seconds,
+            interval_seconds=interval_seconds,
+            concurrency=poll_concurrency,
+            expected_seconds=[expected_poll_seconds(history, key) for key in history_keys],
+            min_interval_seconds=min_interval_seconds,
+            max_interval_seconds=max_interval_seconds,
+            callbacks=callbacks,
+            fallback_interval_seconds=fallback_interval_seconds,
+            arrivals=drain_arrivals if arrivals is not None else None,
+        ):
+            position = pending[pending_index]
+            if budget is not None:
+                budget.release(tasks[position]["index"])
+            if model_slots is not None:
+                model_slots.release(tasks[position]["index"])
+            raw = raw_log.record("status", tasks[position]["index"], result["raw"]) if raw_log is not None else None
+            result = dict(result, raw=raw)
+            results[position] = dict(result, files=[])
+            if journal is not None:
+                journal.append(
+                    "result",
+                    index=tasks[position]["index"],
+                    result={key: result[key] for key in ["status", "urls", "error_message", "raw"]},
+                )
+            if result["status"] == "completed":
+                fresh_samples.setdefault(history_keys[pending_index], []).append(result["elapsed_seconds"])
+            if result["status"] == "completed" and result["urls"]:
+                task = tasks[position]
+                future = download_executor.submit(
+                    download_task_files,
+                    task.get("output_dir", output_dir),
+                    task.get("file_index", task["index"]),
+                    task["style_key"],
+                    result["urls"],
+                )
+                future.add_done_callback(lambda done, position=position: on_downloaded(position, done))
+            else:
+                finish(position, result["status"], result["error_message"])
+
+    save_poll_history(poll_history_path, fresh_samples)
+    return results
 
 
 def ensure_output_dir(download_dir: str) -> str:
     resolved = download_dir.strip()
     if not resolved:
         timestamp = time.strftime("%Y%m%d-%H%M%S")
-        resolved = os.path.join(".temp", f"model-example-collection-{timestamp}")
+        # The pid keeps runs started in the same second apart; a default directory is never shared.
+        resolved = os.path.join(".temp", f"model-example-collection-{timestamp}-{os.getpid()}")
+        os.makedirs(resolved)
 
     os.makedirs(resolved, exist_ok=True)
     return os.path.abspath(resolved)
@@ -787,13 +2389,132 @@ def infer_extension(url: str) -> str:
     return ".png"
 
 
-def download_file(url: str, output_path: str) -> None:
-    request = urllib.request.Request(url, method="GET")
-    with urllib.request.urlopen(request) as response:
-        content = response.read()
+def download_file(
+    url: str,
+    output_path: str,
+    headers: Optional[Dict[str, str]] = None,
+    read_timeout: Optional[float] = None,
+    max_attempts: int = DOWNLOAD_MAX_ATTEMPTS,
+) -> int:
+    host = urllib.parse.urlparse(url).hostname or ""
+    with METRICS.span("download_file", host=host):
+        route = f"download {host}"
+        delay = RESILIENCE.hedge_delay(route)
+        deadline = time.monotonic() + RESILIENCE.download_deadline_seconds
+        started = time.monotonic()
+        if delay is None:
+            size = _download_file(url, output_path, headers, read_timeout, max_attempts)
+            RESILIENCE.record_latency(route, time.monotonic() - started)
+            return size
+
+        hedge_path = output_path + ".hedge"
+
+        def primary() -> Tuple[str, int]:
+            return output_path, _download_file(url, output_path, headers, read_timeout, max_attempts)
+
+        def backup() -> Tuple[str, int]:
+            return hedge_path, _download_file(url, hedge_path, headers, read_timeout, max_attempts)
+
+        (path, size), loser = RESILIENCE.race(host, primary, backup, delay, deadline)
+        RESILIENCE.record_latency(route, time.monotonic() - started)
+        if path == hedge_path:
+            os.replace(hedge_path, output_path)
+        if loser is not None:
+            loser.add_done_callback(lambda _: discard_hedge_files(output_path, hedge_path))
+        return size
+
+
+def discard_hedge_files(output_path: str, hedge_path: str) -> None:
+    for path in [output_path + ".part", hedge_path, hedge_path + ".part"]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _download_file(
+    url: str,
+    output_path: str,
+    headers: Optional[Dict[str, str]],
+    read_timeout: Optional[float],
+    max_attempts: int,
+) -> int:
+    partial_path = output_path + ".part"
+    host = urllib.parse.urlparse(url).hostname or ""
+    breaker = RESILIENCE.breaker(host)
+    deadline = time.monotonic() + RESILIENCE.download_deadline_seconds
+    attempt = 0
+    while attempt < max_attempts:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Download deadline of {RESILIENCE.download_deadline_seconds}s exceeded: {url}")
+        try:
+            breaker.allow()
+        except CircuitOpenError as error:
+            # Waiting out an open circuit sends nothing, so it does not use up an attempt.
+            time.sleep(min(error.retry_in, remaining))
+            continue
+        attempt += 1
+        if attempt > 1:
+            METRICS.inc("download_retries_total", host=host)
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+
+        retry_after = None
+        try:
+            attempt_timeout = max(0.1, min(read_timeout or HTTP_CLIENT.read_timeout, remaining))
+            with HTTP_CLIENT.open("GET", url, request_headers, read_timeout=attempt_timeout) as response:
+                breaker.record(response.status not in RETRY_STATUSES)
+                if response.status == 416 and offset:
+                    response.read()
+                    os.remove(partial_path)
+                    continue
+                if response.status in RETRY_STATUSES:
+                    response.read()
+                    retry_after = retry_after_seconds(response.getheader("Retry-After"))
+                    raise HttpStatusError(response.status, f"Download failed: {response.status}, url: {url}")
+                if response.status not in {200, 206}:
+                    body_text = response.read().decode("utf-8", errors="replace")
+                    raise RuntimeError(f"Download failed: {response.status}, url: {url}, body: {body_text[:200]}")
+
+                resumed = response.status == 206 and (response.getheader("Content-Range") or "").startswith(
+                    f"bytes {offset}-"
+                )
+                expected = response.getheader("Content-Length")
+                received = 0
+                digest = hashlib.sha256()
+                if resumed:
+                    with open(partial_path, "rb") as existing:
+                        for block in iter(lambda: existing.read(DOWNLOAD_CHUNK_SIZE), b""):
+                            digest.update(block)
+                with open(partial_path, "ab" if resumed else "wb") as file:
+                    while True:
+                        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        file.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(f"Download deadline exceeded mid-transfer: {url}")
+                METRICS.inc("http_received_bytes_total", received, host=host)
+
+                if expected is not None and received < int(expected):
+                    raise http.client.IncompleteRead(b"", int(expected) - received)
+        except (OSError, http.client.HTTPException, HttpStatusError) as error:
+            if not isinstance(error, HttpStatusError):
+                breaker.record(False)
+            if attempt >= max_attempts or time.monotonic() >= deadline:
+                raise
+            RESILIENCE.backoff(attempt, deadline, retry_after)
+            continue
+
+        size = os.path.getsize(partial_path)
+        BLOB_STORE.place(partial_path, digest.hexdigest(), output_path)
+        METRICS.observe("download_size_bytes", size)
+        return size
 
-    with open(output_path, "wb") as file:
-        file.write(content)
+    raise RuntimeError(f"Download failed after {max_attempts} attempts: {url}")
 
 
 def slugify(text: str) -> str:
@@ -809,10 +2530,13 @@ def slugify(text: str) -> str:
     return output or "style"
 
 
-def write_jsonl(path: str, rows: List[Dict]) -> None:
+def write_jsonl(path: str, rows: Iterable[Dict]) -> int:
+    count = 0
     with open(path, "w", encoding="utf-8") as file:
         for row in rows:
             file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
 
 
 def save_collection_manifest(output_dir: str, manifest: Dict) -> str:
@@ -822,6 +2546,512 @@ def save_collection_manifest(output_dir: str, manifest: Dict) -> str:
     return path
 
 
+def save_model_manifests(manifest: Dict, model_uuids: List[str]) -> List[Dict]:
+    models = []
+    for model_uuid in model_uuids:
+        model_dir = model_output_dir(manifest["output_dir"], model_uuid)
+        tasks = [task for task in manifest["tasks"] if task["model_uuid"] == model_uuid]
+        model_manifest = dict(manifest, model_uuid=model_uuid, output_dir=model_dir, tasks=tasks)
+        models.append(
+            {
+                "model_uuid": model_uuid,
+                "output_dir": model_dir,
+                "manifest": save_collection_manifest(model_dir, model_manifest),
+                "task_count": len(tasks),
+                "failed_count": sum(1 for task in tasks if task["status"] != "completed" or not task["files"]),
+            }
+        )
+    return models
+
+
+class CheckpointJournal:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.events = self._load()
+
+    def _load(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        events = []
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a torn last line; everything before it is intact.
+                    break
+                if isinstance(event, dict):
+                    events.append(event)
+        return events
+
+    def append(self, event_type: str, **fields) -> None:
+        event = {"event": event_type, "at": time.strftime("%Y-%m-%d %H:%M:%S"), **fields}
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self.events.append(event)
+
+    def reset(self) -> None:
+        with self.lock:
+            open(self.path, "w", encoding="utf-8").close()
+            self.events = []
+
+    def first(self, event_type: str) -> Optional[Dict]:
+        for event in self.events:
+            if event.get("event") == event_type:
+                return event
+        return None
+
+    def replay(self) -> Dict[int, Dict]:
+        state: Dict[int, Dict] = {}
+        for event in self.events:
+            index = event.get("index")
+            if not isinstance(index, int):
+                continue
+            entry = state.setdefault(index, {})
+            if event["event"] == "submit":
+                entry["submit"] = event
+            elif event["event"] == "result":
+                entry["result"] = event.get("result") or {}
+                entry.pop("files", None)
+            elif event["event"] == "download":
+                entry["files"] = event.get("files") or []
+        return state
+
+
+class NdjsonWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        open(path, "w", encoding="utf-8").close()
+
+    def write(self, row: Dict) -> None:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+
+class RawResponseLog:
+    def __init__(self, mode: str, path: str) -> None:
+        self.mode = mode
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, index: int, response: Optional[Dict]) -> Optional[Dict]:
+        # Returns what callers keep in memory: the response itself inline, nothing once it is in the sidecar.
+        if self.mode == "inline" or response is None:
+            return response
+        line = json.dumps({"kind": kind, "index": index, "response": response}, ensure_ascii=False) + "\n"
+        with self.lock:
+            # One gzip member per line keeps the file readable even if the run dies mid-write.
+            with gzip.open(self.path, "at", encoding="utf-8") as file:
+                file.write(line)
+        return None
+
+
+def open_raw_log(args: argparse.Namespace, output_dir: str) -> Optional[RawResponseLog]:
+    if not args.debug_raw or not output_dir:
+        return None
+    return RawResponseLog(args.debug_raw, os.path.join(output_dir, RAW_SIDECAR_FILENAME))
+
+
+def task_record(index: int, style_key: str, payload: Dict, generation_uuid: str, result: Dict) -> Dict:
+    record = {
+        "index": index,
+        "style_key": style_key,
+        "model_uuid": payload.get("model_uuid", ""),
+        "generation_uuid": generation_uuid,
+        "status": result.get("status", ""),
+        "error_message": result.get("error_message", ""),
+        "elapsed_seconds": result.get("elapsed_seconds"),
+        "poll_count": result.get("poll_count"),
+        "cached": bool(result.get("cached")),
+        "files": [
+            {key: item[key] for key in ["source_url", "local_path", "sha256"] if key in item}
+            for item in result.get("files") or []
+        ],
+    }
+    if result.get("raw") is not None:
+        record["raw"] = result["raw"]
+    return record
+
+
+def settled_result(entry: Dict) -> Optional[Dict]:
+    result = entry.get("result")
+    if not result:
+        return None
+
+    files = entry.get("files")
+    if result.get("status") == "completed" and result.get("urls"):
+        if files is None or not all(os.path.exists(item["local_path"]) for item in files):
+            return None
+    elif result.get("status") != "failed":
+        return None
+
+    return dict(result, raw=result.get("raw"), files=files or [])
+
+
+def generation_cache_key(payload: Dict) -> str:
+    key_fields = {
+        "model_uuid": payload.get("model_uuid", ""),
+        "prompt": payload.get("prompt", ""),
+        "aspect_ratio": payload.get("aspect_ratio", ""),
+        "reference_image_urls": payload.get("reference_image_urls") or [],
+        "batch_size": payload.get("batch_size", 1),
+    }
+    encoded = json.dumps(key_fields, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def link_or_copy(source: str, target: str) -> None:
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class BlobStore:
+    def __init__(self, root: str, max_bytes: int = DEFAULT_BLOB_MAX_MB * 1024 * 1024) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.digests: Dict[Tuple[int, int, int, int], str] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _identity(path: str) -> Tuple[int, int, int, int]:
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def remember(self, path: str, digest: str) -> None:
+        identity = self._identity(path)
+        with self.lock:
+            self.digests[identity] = digest
+
+    def digest_for(self, path: str) -> Optional[str]:
+        try:
+            identity = self._identity(path)
+        except OSError:
+            return None
+        with self.lock:
+            return self.digests.get(identity)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def place(self, source: str, digest: str, target: str) -> None:
+        # source is a finished download; it ends up at target, backed by one shared blob per digest.
+        if not self.root:
+            os.replace(source, target)
+            self.remember(target, digest)
+            return
+
+        blob = self.blob_path(digest)
+        if os.path.exists(blob):
+            try:
+                link_or_copy(blob, target)
+            except FileNotFoundError:
+                pass  # Collected by another run in the meantime; store this copy instead.
+            else:
+                METRICS.inc("blob_dedup_hits_total")
+                METRICS.inc("blob_dedup_bytes_total", os.path.getsize(source))
+                os.remove(source)
+                self.remember(target, digest)
+                return
+
+        # Blobs are shared by every run that links them, so they must never be written in place.
+        os.chmod(source, 0o444)
+        os.replace(source, target)
+        # Link from the placed file so a new blob is never unreferenced, even briefly, for a concurrent collect.
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        with contextlib.suppress(OSError):
+            os.link(target, blob)
+            METRICS.inc("blob_stored_total")
+        self.remember(target, digest)
+
+    def collect_garbage(self) -> None:
+        # A blob whose only link is its own has no run file or cache entry left; drop those, then
+        # the least recently linked ones (link changes bump ctime) while the store is over its cap.
+        if not self.root or not os.path.isdir(self.root):
+            return
+        blobs = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                with contextlib.suppress(FileNotFoundError):
+                    blobs.append((entry.path, entry.stat()))
+
+        referenced = []
+        for path, stat in blobs:
+            if stat.st_nlink <= 1:
+                self._discard(path, stat.st_size)
+            else:
+                referenced.append((stat.st_ctime, path, stat.st_size))
+        total = sum(size for _, _, size in referenced)
+        for _, path, size in sorted(referenced):
+            if total <= self.max_bytes:
+                break
+            self._discard(path, size)
+            total -= size
+
+    def _discard(self, path: str, size: int) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+            METRICS.inc("blob_gc_removed_total")
+            METRICS.inc("blob_gc_bytes_total", size)
+
+
+BLOB_STORE = BlobStore("")
+
+
+def file_sha256(path: str) -> str:
+    digest = BLOB_STORE.digest_for(path)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        BLOB_STORE.remember(path, digest)
+    return digest
+
+
+class GenerationCache:
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                loaded = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return loaded if isinstance(loaded, dict) else {}
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        # Runs sharing a cache merge through the index on disk, so one never drops entries another just added.
+        with self.lock, file_lock(self.index_path):
+            self.entries = self._load()
+            yield
+
+    def _save(self) -> None:
+        write_json_atomic(self.index_path, self.entries)
+
+    def _remove(self, key: str) -> None:
+        self.entries.pop(key, None)
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def restore(self, key: str, output_dir: str, task_index: int, style_key: str) -> Optional[Dict]:
+        with self._locked():
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            cached_paths = [os.path.join(self.root, key, item["name"]) for item in entry["files"]]
+            if not all(os.path.exists(path) for path in cached_paths):
+                self._remove(key)
+                self._save()
+                return None
+            entry["last_used"] = time.time()
+            self._save()
+
+        files = []
+        for image_index, (item, cached_path) in enumerate(zip(entry["files"], cached_paths), start=1):
+            ext = os.path.splitext(item["name"])[1]
+            file_path = os.path.join(output_dir, f"{task_index:02d}-{slugify(style_key)}-{image_index:02d}{ext}")
+            link_or_copy(cached_path, file_path)
+            restored = {"source_url": item["source_url"], "local_path": file_path}
+            if item.get("sha256"):
+                BLOB_STORE.remember(file_path, item["sha256"])
+                restored["sha256"] = item["sha256"]
+            files.append(restored)
+        return {"generation_uuid": entry["generation_uuid"], "files": files}
+
+    def store(self, key: str, generation_uuid: str, files: List[Dict]) -> None:
+        entry_dir = os.path.join(self.root, key)
+        cached_files = [
+            {
+                "name": f"{image_index:02d}{os.path.splitext(item['local_path'])[1]}",
+                "source_url": item["source_url"],
+                "size": os.path.getsize(item["local_path"]),
+                "sha256": file_sha256(item["local_path"]),
+            }
+            for image_index, item in enumerate(files, start=1)
+        ]
+
+        with self._locked():
+            # Linked under the lock, so another run's eviction cannot remove the entry's files half-written.
+            os.makedirs(entry_dir, exist_ok=True)
+            for item, cached in zip(files, cached_files):
+                link_or_copy(item["local_path"], os.path.join(entry_dir, cached["name"]))
+            self.entries[key] = {
+                "generation_uuid": generation_uuid,
+                "files": cached_files,
+                "size": sum(item["size"] for item in cached_files),
+                "last_used": time.time(),
+            }
+            total = sum(entry.get("size", 0) for entry in self.entries.values())
+            for stale_key in sorted(self.entries, key=lambda item: self.entries[item].get("last_used", 0)):
+                if total <= self.max_bytes or stale_key == key:
+                    break
+                total -= self.entries[stale_key].get("size", 0)
+                self._remove(stale_key)
+            self._save()
+
+
+def restore_cached_results(
+    cache: Optional[GenerationCache],
+    payloads: List[Dict],
+    style_types: List[str],
+    placements: List[Tuple[str, int]],
+) -> Dict[int, Dict]:
+    cached: Dict[int, Dict] = {}
+    if cache is None:
+        return cached
+    for position, (payload, style_key) in enumerate(zip(payloads, style_types)):
+        task_dir, file_index = placements[position]
+        hit = cache.restore(generation_cache_key(payload), task_dir, file_index, style_key)
+        if hit is not None:
+            cached[position] = {
+                "generation_uuid": hit["generation_uuid"],
+                "status": "completed",
+                "urls": [item["source_url"] for item in hit["files"]],
+                "error_message": "",
+                "raw": None,
+                "files": hit["files"],
+                "cached": True,
+            }
+    return cached
+
+
+def store_cached_results(
+    cache: Optional[GenerationCache],
+    payloads: List[Dict],
+    generation_uuids: List[str],
+    results: List[Dict],
+) -> None:
+    if cache is None:
+        return
+    for payload, generation_uuid, result in zip(payloads, generation_uuids, results):
+        if result.get("status") == "completed" and result.get("files") and not result.get("cached"):
+            cache.store(generation_cache_key(payload), generation_uuid, result["files"])
+
+
+def add_scheduling_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_MB)
+    parser.add_argument("--blob-dir", default=DEFAULT_BLOB_DIR)
+    parser.add_argument("--blob-max-mb", type=int, default=DEFAULT_BLOB_MAX_MB)
+    parser.add_argument("--submit-concurrency", type=int, default=4)
+    parser.add_argument("--submit-rate", type=float, default=5.0)
+    parser.add_argument("--submit-burst", type=int, default=5)
+    parser.add_argument("--poll-timeout", type=int, default=900)
+    parser.add_argument("--poll-interval", type=int, default=6)
+    parser.add_argument("--poll-min-interval", type=float, default=2)
+    parser.add_argument("--poll-max-interval", type=float, default=30)
+    parser.add_argument("--poll-history", default=DEFAULT_POLL_HISTORY_PATH)
+    parser.add_argument("--poll-concurrency", type=int, default=8)
+    parser.add_argument("--download-concurrency", type=int, default=4)
+    parser.add_argument("--model-concurrency", type=int, default=0)
+    parser.add_argument("--task-budget", type=int, default=0)
+    parser.add_argument("--task-budget-dir", default=DEFAULT_TASK_BUDGET_DIR)
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--read-timeout", type=float, default=120.0)
+    parser.add_argument("--request-deadline", type=float, default=60.0)
+    parser.add_argument("--download-deadline", type=float, default=600.0)
+    parser.add_argument("--request-retries", type=int, default=3)
+    parser.add_argument("--no-hedge", action="store_true")
+    parser.add_argument("--breaker-threshold", type=int, default=5)
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0)
+    parser.add_argument("--debug-raw", nargs="?", const="sidecar", default="", choices=["inline", "sidecar"])
+    parser.add_argument("--callback", action="store_true")
+    parser.add_argument("--callback-host", default="127.0.0.1")
+    parser.add_argument("--callback-port", type=int, default=0)
+    parser.add_argument("--callback-public-url", default="")
+    parser.add_argument("--callback-fallback-interval", type=float, default=60)
+
+
+def apply_scheduling_args(args: argparse.Namespace) -> None:
+    if args.cache_max_mb < 1:
+        raise ValueError("cache_max_mb must be at least 1")
+
+    if args.blob_max_mb < 1:
+        raise ValueError("blob_max_mb must be at least 1")
+
+    if args.submit_concurrency < 1:
+        raise ValueError("submit_concurrency must be at least 1")
+
+    if args.submit_rate <= 0:
+        raise ValueError("submit_rate must be greater than 0")
+
+    if args.submit_burst < 1:
+        raise ValueError("submit_burst must be at least 1")
+
+    if args.poll_timeout < 10:
+        raise ValueError("poll_timeout must be at least 10 seconds")
+
+    if args.poll_interval < 2:
+        raise ValueError("poll_interval must be at least 2 seconds")
+
+    if args.poll_min_interval < 1 or args.poll_max_interval < args.poll_min_interval:
+        raise ValueError("poll_min_interval must be at least 1 and not above poll_max_interval")
+
+    if args.poll_concurrency < 1:
+        raise ValueError("poll_concurrency must be at least 1")
+
+    if args.download_concurrency < 1:
+        raise ValueError("download_concurrency must be at least 1")
+
+    if args.model_concurrency < 0:
+        raise ValueError("model_concurrency must be >= 0")
+
+    if args.task_budget < 0:
+        raise ValueError("task_budget must be >= 0")
+
+    if (args.task_budget or args.model_concurrency) and not args.collect:
+        raise ValueError("task_budget and model_concurrency require --collect, since a slot is held until its task settles")
+
+    if args.connect_timeout <= 0 or args.read_timeout <= 0:
+        raise ValueError("connect_timeout and read_timeout must be greater than 0")
+
+    if args.callback_fallback_interval < 2:
+        raise ValueError("callback_fallback_interval must be at least 2 seconds")
+
+    if args.request_deadline <= 0 or args.download_deadline <= 0:
+        raise ValueError("request_deadline and download_deadline must be greater than 0")
+
+    if args.request_retries < 0:
+        raise ValueError("request_retries must be >= 0")
+
+    if args.breaker_threshold < 1 or args.breaker_cooldown <= 0:
+        raise ValueError("breaker_threshold must be at least 1 and breaker_cooldown greater than 0")
+
+    BLOB_STORE.root = args.blob_dir
+    BLOB_STORE.max_bytes = args.blob_max_mb * 1024 * 1024
+    HTTP_CLIENT.connect_timeout = args.connect_timeout
+    HTTP_CLIENT.read_timeout = args.read_timeout
+    RESILIENCE.deadline_seconds = args.request_deadline
+    RESILIENCE.download_deadline_seconds = args.download_deadline
+    RESILIENCE.max_retries = args.request_retries
+    RESILIENCE.hedge = not args.no_hedge
+    RESILIENCE.breaker_threshold = args.breaker_threshold
+    RESILIENCE.breaker_cooldown_seconds = args.breaker_cooldown
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Build, submit, and optionally collect model example generation results."
@@ -837,11 +3067,12 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--visibility-level", default="public")
     parser.add_argument("--reference-image-urls", default="")
     parser.add_argument("--output", default="")
+    parser.add_argument("--prompts-per-style", type=int, default=0)
     parser.add_argument("--run", action="store_true")
     parser.add_argument("--collect", action="store_true")
     parser.add_argument("--download-dir", default="")
-    parser.add_argument("--poll-timeout", type=int, default=900)
-    parser.add_argument("--poll-interval", type=int, default=6)
+    parser.add_argument("--resume", default="")
+    add_scheduling_arguments(parser)
     parser.add_argument("--provider", default="kie", choices=["kie", "project"])
     parser.add_argument("--api-base", default="")
     parser.add_argument("--header", action="append", default=[])
@@ -849,67 +3080,192 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def main() -> int:
-    parser = build_parser()
-    args = parser.parse_args()
-    load_env()
-
-    if args.list_types:
-        print("\n".join(sorted(STYLE_CATALOG.keys())))
-        return 0
-
-    if not args.model_uuid.strip():
-        raise ValueError("model_uuid must not be empty")
-
-    if args.batch_size < 1 or args.batch_size > 4:
-        raise ValueError("batch_size must be in range 1..4")
-
-    if args.poll_timeout < 10:
-        raise ValueError("poll_timeout must be at least 10 seconds")
-
-    if args.poll_interval < 2:
-        raise ValueError("poll_interval must be at least 2 seconds")
-
-    if not args.run_id:
-        args.run_id = f"run-{time.strftime('%Y%m%d%H%M%S')}-{random.randint(1000, 9999)}"
-
-    style_types = parse_types(args.types)
-    used_subject_anchors = set()
-    payloads = []
-    for style_key in style_types:
-        subject_anchor = pick_unique_subject_anchor(args.run_id, style_key, used_subject_anchors)
-        payloads.append(build_payload(args, style_key, subject_anchor))
-
-    if args.output:
-        write_jsonl(args.output, payloads)
-
-    if not args.run and not args.collect:
-        print(json.dumps({"count": len(payloads), "payloads": payloads}, ensure_ascii=False, indent=2))
-        return 0
+def run_tasks(
+    args: argparse.Namespace,
+    style_types: List[str],
+    payloads: List[Dict],
+    headers: Dict[str, str],
+    callbacks: Optional[CallbackReceiver],
+    output_dir: str,
+    journal: Optional[CheckpointJournal],
+    allow_create_failures: bool = False,
+    on_result: Optional[Callable[[int, Dict], None]] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    cache = None
+    if args.collect and args.cache_dir:
+        cache = GenerationCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    placements = task_placements(payloads, output_dir)
+    raw_log = open_raw_log(args, output_dir)
+    task_manifest = NdjsonWriter(os.path.join(output_dir, TASK_MANIFEST_FILENAME)) if args.collect and output_dir else None
+    budget = open_task_budget(args, headers)
+    model_slots = ModelSlots(args.model_concurrency) if args.model_concurrency > 0 else None
+    # Budget and model slots are only freed when their task settles, so submission has to overlap collection.
+    arrivals = TaskArrivals() if budget is not None or model_slots is not None else None
+    submission_records: List[Dict] = [{} for _ in payloads]
+
+    def record_result(index: int, result: Dict) -> None:
+        if task_manifest is not None:
+            generation_uuid = result.get("generation_uuid") or submission_records[index - 1]["generation_uuid"]
+            task_manifest.write(task_record(index, style_types[index - 1], payloads[index - 1], generation_uuid, result))
+        if on_result:
+            on_result(index, result)
+
+    cached = restore_cached_results(cache, payloads, style_types, placements)
+    for done, position in enumerate(sorted(cached), start=1):
+        report_progress(done, len(cached), style_types[position], "cached", f"{len(cached[position]['files'])} file(s)")
+        record_result(position + 1, cached[position])
+
+    def register(position: int, task: Dict) -> None:
+        record = {
+            "style_key": style_types[position],
+            "payload": payloads[position],
+            "generation_uuid": task.get("generation_uuid", ""),
+            "create_response": task.get("create_response"),
+        }
+        if position in cached:
+            record["generation_uuid"] = cached[position]["generation_uuid"]
+        elif not record["generation_uuid"]:
+            if budget is not None:
+                budget.release(position + 1)
+            if model_slots is not None:
+                model_slots.release(position + 1)
+            if not allow_create_failures:
+                raise RuntimeError(task.get("create_error") or "Missing generation ID in create response")
+            record["create_error"] = task.get("create_error", "")
+        submission_records[position] = record
+        if "create_error" in record and args.collect:
+            record_result(position + 1, {"status": "create_failed", "error_message": record["create_error"]})
+        if arrivals is not None and position not in cached:
+            arrivals.put(position + 1, record["generation_uuid"])
+
+    def submit(on_created: Optional[Callable[[int, Dict], None]] = None) -> List[Dict]:
+        with METRICS.span("stage", stage="submit"):
+            return submit_pending(
+                args.provider,
+                args.api_base,
+                headers,
+                payloads,
+                concurrency=args.submit_concurrency,
+                limiter=TokenBucket(args.submit_rate, args.submit_burst),
+                callback_url=callbacks.url if callbacks is not None else "",
+                journal=journal,
+                skip_positions=set(cached),
+                model_slots=model_slots,
+                raw_log=raw_log,
+                budget=budget,
+                on_created=on_created,
+                # Collect runs only need the task ID; full create responses stay behind --debug-raw.
+                keep_responses=not args.collect or args.debug_raw == "inline",
+            )
 
-    if args.provider == "project" and not args.api_base:
-        raise ValueError("api_base is required when provider=project and run or collect is enabled")
+    def collect(pending: List[int]) -> List[Dict]:
+        with METRICS.span("stage", stage="collect"):
+            return collect_streaming(
+                args.provider,
+                args.api_base,
+                headers,
+                [
+                    {
+                        "index": position + 1,
+                        "style_key": style_types[position],
+                        "generation_uuid": submission_records[position]["generation_uuid"] if arrivals is None else "",
+                        "model_uuid": payloads[position].get("model_uuid", args.model_uuid),
+                        "output_dir": placements[position][0],
+                        "file_index": placements[position][1],
+                    }
+                    for position in pending
+                ],
+                output_dir,
+                timeout_seconds=args.poll_timeout,
+                interval_seconds=args.poll_interval,
+                poll_concurrency=args.poll_concurrency,
+                download_concurrency=args.download_concurrency,
+                model_uuid=args.model_uuid,
+                poll_history_path=args.poll_history,
+                min_interval_seconds=args.poll_min_interval,
+                max_interval_seconds=args.poll_max_interval,
+                callbacks=callbacks,
+                fallback_interval_seconds=args.callback_fallback_interval,
+                journal=journal,
+                on_result=record_result,
+                model_slots=model_slots,
+                raw_log=raw_log,
+                arrivals=arrivals,
+                budget=budget,
+            )
 
-    headers = resolve_provider_headers(args.provider, parse_headers(args.header))
+    if arrivals is None:
+        for position, task in enumerate(submit()):
+            register(position, task)
+        if not args.collect:
+            return submission_records, []
+        pending = [
+            position
+            for position, record in enumerate(submission_records)
+            if position not in cached and record["generation_uuid"]
+        ]
+        collected = collect(pending)
+    else:
+        for position in cached:
+            register(position, {})
+        pending = [position for position in range(len(payloads)) if position not in cached]
+        with ThreadPoolExecutor(max_workers=1) as submitter:
+            submitting = submitter.submit(submit, register)
+            submitting.add_done_callback(lambda done: arrivals.close(done.exception()))
+            try:
+                collected = collect(pending)
+            finally:
+                # Frees this run's slots and stops a submitter still queued for one if collection failed.
+                if budget is not None:
+                    budget.close()
+                if model_slots is not None:
+                    model_slots.close()
+            submitting.result()
+
+    results = [cached.get(position, {}) for position in range(len(submission_records))]
+    for position, result in zip(pending, collected):
+        results[position] = result
+    store_cached_results(cache, payloads, [record["generation_uuid"] for record in submission_records], results)
+    # Cache eviction above only drops links; blobs nothing links to anymore are freed here.
+    BLOB_STORE.collect_garbage()
+    return submission_records, results
+
+
+def submit_and_collect(
+    args: argparse.Namespace,
+    style_types: List[str],
+    payloads: List[Dict],
+    headers: Dict[str, str],
+    callbacks: Optional[CallbackReceiver],
+) -> int:
+    output_dir = ""
+    journal = None
+    if args.collect:
+        output_dir = ensure_output_dir(args.download_dir)
+        journal = CheckpointJournal(os.path.join(output_dir, JOURNAL_FILENAME))
+        if not args.resume:
+            # Only --resume picks up an earlier run's tasks; any other run into this directory starts over.
+            journal.reset()
+        if journal.first("run") is None:
+            journal.append(
+                "run",
+                run_id=args.run_id,
+                model_uuid=args.model_uuid,
+                provider=args.provider,
+                style_types=style_types,
+                payloads=payloads,
+            )
 
-    submission_records = []
-    for style_key, payload in zip(style_types, payloads):
-        response = submit_payload(args.provider, args.api_base, headers, payload)
-        generation_uuid = extract_generation_uuid(args.provider, response)
-        submission_records.append(
-            {
-                "style_key": style_key,
-                "payload": payload,
-                "generation_uuid": generation_uuid,
-                "create_response": response,
-            }
-        )
+    try:
+        submission_records, results = run_tasks(args, style_types, payloads, headers, callbacks, output_dir, journal)
+    finally:
+        if output_dir:
+            metrics_json, metrics_prom = METRICS.write(output_dir)
 
     if not args.collect:
         print(json.dumps({"count": len(submission_records), "submissions": submission_records}, ensure_ascii=False, indent=2))
         return 0
 
-    output_dir = ensure_output_dir(args.download_dir)
     manifest = {
         "model_uuid": args.model_uuid,
         "theme": args.theme,
@@ -919,45 +3275,27 @@ def main() -> int:
         "tasks": [],
     }
 
+    model_uuids = parse_model_uuids(args.model_uuid)
     failed_tasks = []
     downloaded_count = 0
-
-    for task_index, record in enumerate(submission_records, start=1):
+    for task_index, (record, result) in enumerate(zip(submission_records, results), start=1):
         style_key = record["style_key"]
         generation_uuid = record["generation_uuid"]
 
-        result = poll_until_done(
-            args.provider,
-            args.api_base,
-            headers,
-            generation_uuid,
-            timeout_seconds=args.poll_timeout,
-            interval_seconds=args.poll_interval,
-        )
-
         task_manifest = {
             "index": task_index,
             "style_key": style_key,
             "generation_uuid": generation_uuid,
             "status": result["status"],
             "error_message": result["error_message"],
-            "files": [],
+            "files": result["files"],
+            "cached": bool(result.get("cached")),
         }
+        if len(model_uuids) > 1:
+            task_manifest["model_uuid"] = record["payload"]["model_uuid"]
+        downloaded_count += len(result["files"])
 
-        if result["status"] == "completed" and result["urls"]:
-            for image_index, image_url in enumerate(result["urls"], start=1):
-                ext = infer_extension(image_url)
-                filename = f"{task_index:02d}-{slugify(style_key)}-{image_index:02d}{ext}"
-                file_path = os.path.join(output_dir, filename)
-                download_file(image_url, file_path)
-                downloaded_count += 1
-                task_manifest["files"].append(
-                    {
-                        "source_url": image_url,
-                        "local_path": file_path,
-                    }
-                )
-        else:
+        if not (result["status"] == "completed" and result["urls"]):
             failed_tasks.append(
                 {
                     "style_key": style_key,
@@ -969,15 +3307,24 @@ def main() -> int:
 
         manifest["tasks"].append(task_manifest)
 
+    if len(model_uuids) > 1:
+        manifest["models"] = save_model_manifests(manifest, model_uuids)
     manifest_path = save_collection_manifest(output_dir, manifest)
 
     summary = {
         "output_dir": output_dir,
         "manifest": manifest_path,
+        "task_manifest": os.path.join(output_dir, TASK_MANIFEST_FILENAME),
+        "metrics": metrics_json,
+        "metrics_prom": metrics_prom,
         "task_count": len(submission_records),
         "downloaded_files": downloaded_count,
         "failed_tasks": failed_tasks,
     }
+    if "models" in manifest:
+        summary["models"] = manifest["models"]
+    if args.debug_raw == "sidecar":
+        summary["raw_responses"] = os.path.join(output_dir, RAW_SIDECAR_FILENAME)
 
     print(json.dumps(summary, ensure_ascii=False, indent=2))
 
@@ -987,6 +3334,86 @@ def main() -> int:
     return 0
 
 
+def main() -> int:
+    parser = build_parser()
+    args = parser.parse_args()
+    load_env()
+
+    if args.list_types:
+        print("\n".join(sorted(STYLE_CATALOG.keys())))
+        return 0
+
+    journal = None
+    if args.resume:
+        journal_path = os.path.join(args.resume, JOURNAL_FILENAME)
+        if not os.path.exists(journal_path):
+            raise ValueError(f"No checkpoint journal found in {args.resume}")
+        journal = CheckpointJournal(journal_path)
+        run_event = journal.first("run")
+        if run_event is None:
+            raise ValueError(f"Checkpoint journal has no run record: {journal_path}")
+        args.collect = True
+        args.download_dir = args.resume
+        args.run_id = run_event["run_id"]
+        args.model_uuid = run_event["model_uuid"]
+        args.provider = run_event["provider"]
+
+    model_uuids = parse_model_uuids(args.model_uuid)
+    if not model_uuids:
+        raise ValueError("model_uuid must not be empty")
+
+    if args.batch_size < 1 or args.batch_size > 4:
+        raise ValueError("batch_size must be in range 1..4")
+
+    apply_scheduling_args(args)
+
+    if not args.run_id:
+        args.run_id = f"run-{time.strftime('%Y%m%d%H%M%S')}-{random.randint(1000, 9999)}"
+
+    if args.prompts_per_style:
+        if args.prompts_per_style < 0:
+            raise ValueError("prompts_per_style must be >= 0")
+        if not args.output:
+            raise ValueError("--prompts-per-style streams to --output, which is required")
+        if args.run or args.collect:
+            raise ValueError("--prompts-per-style only writes prompt sets; drop --run/--collect/--resume")
+        style_types = parse_types(args.types)
+        rows = fan_out(iter_bulk_payloads(args, style_types, args.prompts_per_style), model_uuids)
+        count = write_jsonl(args.output, rows)
+        print(json.dumps({"count": count, "output": args.output, "run_id": args.run_id}, ensure_ascii=False))
+        return 0
+
+    if journal is not None:
+        style_types = journal.first("run")["style_types"]
+        payloads = journal.first("run")["payloads"]
+    else:
+        style_types = parse_types(args.types)
+        payloads = list(fan_out(build_payloads(args, style_types), model_uuids))
+        style_types = [style_key for style_key in style_types for _ in model_uuids]
+
+    if args.output:
+        write_jsonl(args.output, payloads)
+
+    if not args.run and not args.collect:
+        print(json.dumps({"count": len(payloads), "payloads": payloads}, ensure_ascii=False, indent=2))
+        return 0
+
+    if args.provider == "project" and not args.api_base:
+        raise ValueError("api_base is required when provider=project and run or collect is enabled")
+
+    if args.callback and (args.provider != "kie" or not args.collect):
+        raise ValueError("callback mode requires provider=kie and --collect")
+
+    headers = resolve_provider_headers(args.provider, parse_headers(args.header))
+
+    callbacks = None
+    if args.callback:
+        callbacks = CallbackReceiver(args.callback_host, args.callback_port, args.callback_public_url)
+
+    with callbacks if callbacks is not None else contextlib.nullcontext():
+        return submit_and_collect(args, style_types, payloads, headers, callbacks)
+
+
 if __name__ == "__main__":
     try:
         sys.exit(main())
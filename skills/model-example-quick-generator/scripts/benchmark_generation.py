@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import batch_generate_examples as gen
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # Hedged requests abandon their slower twin, so clients hanging up mid-response is expected.
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class MockProvider:
+    def __init__(
+        self,
+        latency: str,
+        latency_median: float,
+        latency_spread: float,
+        failure_rate: float,
+        reject_rate: float,
+        image_kb: int,
+        image_kb_spread: float,
+        seed: int,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_spread = latency_spread
+        self.failure_rate = failure_rate
+        self.reject_rate = reject_rate
+        self.image_kb = image_kb
+        self.image_kb_spread = image_kb_spread
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        max_bytes = int(image_kb * 1024 * (1 + image_kb_spread)) + 1
+        self.image_bytes = PNG_SIGNATURE + os.urandom(max_bytes)
+        self.lock = threading.Lock()
+        self.tasks: dict[str, dict] = {}
+        self.requests: dict[str, int] = {}
+        self.server: ThreadingHTTPServer | None = None
+
+    def reset(self) -> None:
+        with self.lock:
+            self.tasks = {}
+            self.requests = {}
+
+    def count(self, route: str) -> None:
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def sample_latency(self) -> float:
+        if self.latency == "fixed":
+            return self.latency_median
+        if self.latency == "uniform":
+            low = self.latency_median * (1 - self.latency_spread)
+            high = self.latency_median * (1 + self.latency_spread)
+            return max(0.0, self.random.uniform(low, high))
+        return self.random.lognormvariate(math.log(self.latency_median), self.latency_spread)
+
+    def fault(self) -> str:
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.stall_rate:
+            return "stall"
+        return ""
+
+    def create(self) -> dict | None:
+        with self.lock:
+            if self.random.random() < self.reject_rate:
+                return None
+            size = int(self.image_kb * 1024 * self.random.uniform(1 - self.image_kb_spread, 1 + self.image_kb_spread))
+            task = {
+                "id": uuid.uuid4().hex,
+                "created_at": time.monotonic(),
+                "ready_at": time.monotonic() + self.sample_latency(),
+                "failed": self.random.random() < self.failure_rate,
+                "size": max(len(PNG_SIGNATURE), size),
+                "downloaded_at": None,
+            }
+            self.tasks[task["id"]] = task
+            return task
+
+    def state(self, task_id: str) -> tuple[dict | None, str]:
+        with self.lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None, "missing"
+        if time.monotonic() < task["ready_at"]:
+            return task, "running"
+        return task, "failed" if task["failed"] else "completed"
+
+    def image_url(self, task_id: str) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/img/{task_id}.png"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                return
+
+            def send_json(self, payload: dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                path = urllib.parse.urlparse(self.path).path
+                if path == "/api/v1/jobs/createTask":
+                    provider.count("create")
+                    task = provider.create()
+                    if task is None:
+                        self.send_json({"code": 402, "msg": "Credits insufficient"})
+                    else:
+                        self.send_json({"code": 200, "msg": "success", "data": {"taskId": task["id"]}})
+                elif path == "/api/anime-generation/create-task":
+                    provider.count("create")
+                    task = provider.create()
+                    if task is None:
+                        # Like the KIE branch, a rejection is a 2xx body without a task ID, so it counts as a reject.
+                        self.send_json({"success": False, "error": "Insufficient credits"})
+                    else:
+                        self.send_json({"success": True, "data": {"generation_uuid": task["id"]}})
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+            def do_GET(self) -> None:
+                parsed = urllib.parse.urlparse(self.path)
+                fault = provider.fault()
+                if fault == "error":
+                    provider.count("error")
+                    self.send_json({"error": "Service unavailable"}, 503)
+                    return
+                if fault == "stall":
+                    provider.count("stall")
+                    time.sleep(provider.stall_seconds)
+                if parsed.path == "/api/v1/jobs/recordInfo":
+                    provider.count("status")
+                    task_id = urllib.parse.parse_qs(parsed.query).get("taskId", [""])[0]
+                    task, state = provider.state(task_id)
+                    if task is None:
+                        self.send_json({"code": 404, "msg": "Task not found"})
+                        return
+                    data = {"taskId": task_id, "state": {"running": "generating", "failed": "fail"}.get(state, "success")}
+                    if state == "completed":
+                        data["resultJson"] = json.dumps({"resultUrls": [provider.image_url(task_id)]})
+                    elif state == "failed":
+                        data["failMsg"] = "Mock generation failure"
+                    self.send_json({"code": 200, "msg": "success", "data": data})
+                elif parsed.path.startswith("/api/generation/status/"):
+                    provider.count("status")
+                    task_id = parsed.path.rsplit("/", 1)[-1]
+                    task, state = provider.state(task_id)
+                    if task is None:
+                        self.send_json({"code": -1, "message": "Generation not found"}, 404)
+                        return
+                    data = {"uuid": task_id, "status": {"running": "processing"}.get(state, state), "results": []}
+                    if state == "completed":
+                        data["results"] = [{"image_url": provider.image_url(task_id)}]
+                    elif state == "failed":
+                        data["error_message"] = "Mock generation failure"
+                    self.send_json({"code": 0, "message": "ok", "data": data})
+                elif parsed.path.startswith("/img/"):
+                    provider.count("download")
+                    task_id = parsed.path.rsplit("/", 1)[-1].split(".")[0]
+                    task, state = provider.state(task_id)
+                    if task is None or state != "completed":
+                        self.send_json({"error": "not found"}, 404)
+                        return
+                    body = provider.image_bytes[: task["size"]]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    with provider.lock:
+                        task["downloaded_at"] = time.monotonic()
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+        self.server = QuietServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+def run_benchmark(args, provider: MockProvider, base_url: str, task_count: int) -> dict:
+    provider.reset()
+    payloads = [
+        {
+            "model_uuid": "benchmark-model",
+            "prompt": f"benchmark prompt {index}",
+            "aspect_ratio": "3:4",
+            "batch_size": 1,
+            "visibility_level": "public",
+        }
+        for index in range(task_count)
+    ]
+    style_types = ["benchmark"] * task_count
+    args.api_base = base_url
+    gen.KIE_CREATE_TASK_URL = f"{base_url}/api/v1/jobs/createTask"
+    gen.KIE_QUERY_TASK_URL = f"{base_url}/api/v1/jobs/recordInfo"
+
+    with tempfile.TemporaryDirectory(prefix="model-example-benchmark-") as output_dir:
+        progress = contextlib.nullcontext() if args.verbose else contextlib.redirect_stderr(io.StringIO())
+        started = time.monotonic()
+        with progress:
+            records, results = gen.run_tasks(
+                args,
+                style_types,
+                payloads,
+                {},
+                None,
+                output_dir,
+                None,
+                allow_create_failures=True,
+            )
+        wall_seconds = time.monotonic() - started
+        image_bytes = sum(
+            os.path.getsize(file["local_path"]) for result in results for file in result.get("files", [])
+        )
+
+    with provider.lock:
+        tasks = list(provider.tasks.values())
+        requests = dict(provider.requests)
+    latencies = [task["downloaded_at"] - task["created_at"] for task in tasks if task["downloaded_at"] is not None]
+    images = sum(len(result.get("files", [])) for result in results)
+    failed = sum(1 for result in results if result.get("status") not in {None, "completed"})
+    rejected = sum(1 for record in records if "create_error" in record)
+    total_requests = sum(requests.values())
+
+    return {
+        "tasks": task_count,
+        "wall_seconds": round(wall_seconds, 3),
+        "images": images,
+        "images_per_second": round(images / wall_seconds, 2) if wall_seconds else None,
+        "image_megabytes": round(image_bytes / (1024 * 1024), 2),
+        "requests": requests,
+        "requests_per_image": round(total_requests / images, 2) if images else None,
+        "status_per_image": round(requests.get("status", 0) / images, 2) if images else None,
+        "failed_tasks": failed,
+        "rejected_creates": rejected,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+    }
+
+
+def format_table(reports: list[dict]) -> str:
+    columns = [
+        ("tasks", "tasks"),
+        ("wall_s", "wall_seconds"),
+        ("img/s", "images_per_second"),
+        ("req/img", "requests_per_image"),
+        ("status/img", "status_per_image"),
+        ("failed", "failed_tasks"),
+        ("rejected", "rejected_creates"),
+        ("p50_s", "latency_p50"),
+        ("p95_s", "latency_p95"),
+        ("p99_s", "latency_p99"),
+    ]
+    rows = [[title for title, _ in columns]]
+    rows += [["-" if report[key] is None else str(report[key]) for _, key in columns] for report in reports]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark model example generation scheduling against a local mock provider"
+    )
+    parser.add_argument("--tasks", default="10,100,1000", help="Comma-separated task counts to run")
+    parser.add_argument("--provider", choices=["kie", "project"], default="kie")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-median", type=float, default=3.0, help="Median seconds until a task completes")
+    parser.add_argument(
+        "--latency-spread",
+        type=float,
+        default=0.4,
+        help="Lognormal sigma, or +/- fraction of the median for uniform",
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of tasks that end in a failed state")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of create calls rejected without a task ID")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of status and download calls answered with 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of status and download calls that stall")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="How long a stalled call hangs before answering")
+    parser.add_argument("--image-kb", type=int, default=128)
+    parser.add_argument("--image-kb-spread", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-out", default="", help="Also write the report as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="Show per-task progress lines")
+    gen.add_scheduling_arguments(parser)
+    parser.set_defaults(collect=True, cache_dir="", blob_dir="", poll_history="", callback=False)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    task_counts = [int(value) for value in args.tasks.split(",") if value.strip()]
+    if not task_counts or min(task_counts) < 1:
+        raise ValueError("tasks must be a comma-separated list of positive integers")
+
+    if args.latency_median <= 0 or args.latency_spread < 0:
+        raise ValueError("latency_median must be > 0 and latency_spread >= 0")
+
+    for name in ["failure_rate", "reject_rate", "error_rate", "stall_rate", "image_kb_spread"]:
+        if not 0 <= getattr(args, name) <= 1:
+            raise ValueError(f"{name} must be in range 0..1")
+
+    if args.error_rate + args.stall_rate > 1 or args.stall_seconds < 0:
+        raise ValueError("error_rate + stall_rate must not exceed 1 and stall_seconds must be >= 0")
+
+    if args.callback:
+        raise ValueError("--callback is not supported by the benchmark mock")
+
+    gen.apply_scheduling_args(args)
+    args.model_uuid = "benchmark-model"
+
+    provider = MockProvider(
+        args.latency,
+        args.latency_median,
+        args.latency_spread,
+        args.failure_rate,
+        args.reject_rate,
+        args.image_kb,
+        args.image_kb_spread,
+        args.seed,
+        args.error_rate,
+        args.stall_rate,
+        args.stall_seconds,
+    )
+    base_url = provider.start()
+    reports = []
+    try:
+        for task_count in task_counts:
+            print(f"Running {task_count} task(s)...", file=sys.stderr, flush=True)
+            reports.append(run_benchmark(args, provider, base_url, task_count))
+    finally:
+        provider.stop()
+
+    print(format_table(reports))
+    if args.json_out:
+        settings = {
+            key: getattr(args, key)
+            for key in sorted(vars(args))
+            if key not in {"api_base", "json_out", "verbose", "tasks"}
+        }
+        report = {"settings": settings, "runs": reports}
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
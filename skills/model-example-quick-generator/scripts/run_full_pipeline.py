@@ -1,16 +1,24 @@
 #!/usr/bin/env python3
 import argparse
-import base64
+import contextlib
 import hashlib
+import hmac
+import http.client
+import importlib.util
 import json
 import os
 import pathlib
-import subprocess
+import queue
+import random
 import sys
+import threading
 import time
 import urllib.parse
-import urllib.request
-from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from xml.etree import ElementTree
+
+import batch_generate_examples as gen
 
 
 def load_env() -> None:
@@ -29,275 +37,940 @@ def load_env() -> None:
                 os.environ[key] = value
 
 
-def run_generation(args, work_dir: pathlib.Path) -> tuple[pathlib.Path, pathlib.Path]:
-    run_id = datetime.now().strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
-    requests_jsonl = work_dir / "requests.jsonl"
+DEFAULT_STATE_PATH = ".temp/z-image-pipeline-state.json"
+STATE_ITEM_LIMIT = 5000
 
-    cmd = [
-        "python3",
-        "skills/model-example-quick-generator/scripts/batch_generate_examples.py",
-        "--model-uuid",
-        args.model_uuid,
-        "--types",
-        args.types,
-        "--aspect-ratio",
-        args.aspect_ratio,
-        "--run-id",
-        run_id,
-        "--output",
-        str(requests_jsonl),
-    ]
-    if args.theme:
-        cmd.extend(["--theme", args.theme])
-    if args.character:
-        cmd.extend(["--character", args.character])
-    if args.lock_character:
-        cmd.append("--lock-character")
 
-    subprocess.run(cmd, check=True)
+def fingerprint(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    summary_path = work_dir / "generation-summary.json"
 
-    python = f'''
-import json, pathlib, urllib.request, urllib.parse, time
-rows = [json.loads(x) for x in pathlib.Path(r"{requests_jsonl}").read_text(encoding="utf-8").splitlines() if x.strip()]
-api_key = {json.dumps(os.environ.get("KIE_AI_API_KEY") or os.environ.get("API_KEY") or "")}
-if not api_key:
-    raise SystemExit("Missing KIE key")
-headers = {{"Authorization": f"Bearer {{api_key}}", "Content-Type": "application/json"}}
-
-def post_json(url, body):
-    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), headers=headers, method="POST")
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-def get_json(url):
-    req = urllib.request.Request(url, headers={{"Authorization": headers["Authorization"]}}, method="GET")
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-work_dir = pathlib.Path(r"{work_dir}")
-manifest = {{"tasks": [], "model": {json.dumps(args.model_uuid)}, "run_id": {json.dumps(run_id)}, "created_at": {json.dumps(datetime.now().isoformat())}}}
-
-types = {json.dumps(args.types.split(","))}
-for i, row in enumerate(rows, start=1):
-    body = {{"model": {json.dumps(args.model_uuid)}, "input": {{"prompt": row["prompt"], "aspect_ratio": {json.dumps(args.aspect_ratio)}}}}}
-    resp = post_json("https://api.kie.ai/api/v1/jobs/createTask", body)
-    task_id = (resp.get("data") or {{}}).get("taskId")
-    if not task_id:
-        manifest["tasks"].append({{"index": i, "style_key": types[i-1], "status": "create_failed", "prompt": row["prompt"]}})
-        continue
-    manifest["tasks"].append({{"index": i, "style_key": types[i-1], "status": "submitted", "task_id": task_id, "prompt": row["prompt"], "files": []}})
-
-for task in manifest["tasks"]:
-    if task["status"] != "submitted":
-        continue
-    end = time.time() + 900
-    while time.time() < end:
-        qurl = "https://api.kie.ai/api/v1/jobs/recordInfo?" + urllib.parse.urlencode({{"taskId": task["task_id"]}})
-        q = get_json(qurl)
-        state = ((q.get("data") or {{}}).get("state") or "").lower()
-        task["last_query"] = q
-        if state in {{"success", "fail"}}:
-            task["status"] = state
-            break
-        time.sleep(6)
-    else:
-        task["status"] = "timeout"
+def file_digest(path: str | pathlib.Path) -> str:
+    return gen.file_sha256(str(path))
 
-    if task["status"] != "success":
-        continue
 
-    result_json = ((task.get("last_query") or {{}}).get("data") or {{}}).get("resultJson")
-    urls = []
-    if isinstance(result_json, str) and result_json.strip():
+def summary_complete(output: pathlib.Path) -> bool:
+    try:
+        summary = json.loads(output.read_text(encoding="utf-8"))
+    except ValueError:
+        return False
+    if summary.get("failed"):
+        return False
+    return all(task.get("status") == "success" for task in summary.get("tasks", []))
+
+
+class PipelineState:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.data: dict = {"stages": {}, "items": {}}
+        self.item_stats: dict[str, dict[str, int]] = {}
+        self.dirty_stages: set[str] = set()
+        self.dirty_items: dict[str, set[str]] = {}
+        self.lock = threading.Lock()
+        self.data.update(self.load())
+
+    def load(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
         try:
-            parsed = json.loads(result_json)
-            urls = parsed.get("resultUrls") or parsed.get("urls") or []
-        except Exception:
-            pass
+            loaded = json.loads(pathlib.Path(self.path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(loaded, dict):
+            return {}
+        return {"stages": loaded.get("stages", {}), "items": loaded.get("items", {})}
 
-    for image_index, url in enumerate(urls, start=1):
-        ext = pathlib.Path(urllib.parse.urlparse(url).path).suffix.lower() or ".png"
-        out = work_dir / f"{{task['index']:02d}}-{{task['style_key']}}-{{image_index:02d}}{{ext}}"
-        req = urllib.request.Request(url, headers={{"User-Agent": "Mozilla/5.0"}}, method="GET")
-        with urllib.request.urlopen(req, timeout=180) as r:
-            out.write_bytes(r.read())
-        task["files"].append({{"source_url": url, "local_path": str(out)}})
+    def stage(self, name: str) -> dict | None:
+        return self.data["stages"].get(name)
 
-pathlib.Path(r"{summary_path}").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
-print(pathlib.Path(r"{summary_path}"))
-'''
-    subprocess.run(["python3", "-c", python], check=True)
-    return requests_jsonl, summary_path
+    def reusable_stage(self, name: str, stage_fingerprint: str) -> pathlib.Path | None:
+        entry = self.stage(name)
+        if not entry or entry.get("fingerprint") != stage_fingerprint:
+            return None
+        output = pathlib.Path(entry["output"])
+        if not output.exists() or file_digest(output) != entry.get("output_digest"):
+            return None
+        return output
 
+    def record_stage(self, name: str, stage_fingerprint: str, output: pathlib.Path) -> None:
+        if not self.path:
+            return
+        self.data["stages"][name] = {
+            "fingerprint": stage_fingerprint,
+            "output": str(output),
+            "output_digest": file_digest(output),
+            "at": datetime.now().isoformat(),
+        }
+        self.dirty_stages.add(name)
 
-def cloudinary_to_webp(work_dir: pathlib.Path) -> pathlib.Path:
-    cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME", "")
-    api_key = os.environ.get("CLOUDINARY_API_KEY", "")
-    api_secret = os.environ.get("CLOUDINARY_API_SECRET", "")
-    if not cloud_name or not api_key or not api_secret:
-        raise RuntimeError("Cloudinary env is missing")
+    def count(self, stage: str, decision: str, amount: int = 1) -> None:
+        with self.lock:
+            stats = self.item_stats.setdefault(stage, {"reused": 0, "run": 0})
+            stats[decision] += amount
 
-    png_files = sorted(work_dir.glob("*.png"))
-    if not png_files:
-        raise RuntimeError("No PNG files found to convert")
+    def item(self, stage: str, item_fingerprint: str) -> dict | None:
+        with self.lock:
+            return self.data["items"].get(stage, {}).get(item_fingerprint)
 
-    webp_dir = work_dir / "webp"
-    webp_dir.mkdir(exist_ok=True)
+    def record_item(self, stage: str, item_fingerprint: str, record: dict) -> None:
+        if not self.path:
+            return
+        with self.lock:
+            items = self.data["items"].setdefault(stage, {})
+            items.pop(item_fingerprint, None)
+            items[item_fingerprint] = record
+            while len(items) > STATE_ITEM_LIMIT:
+                items.pop(next(iter(items)))
+            self.dirty_items.setdefault(stage, set()).add(item_fingerprint)
 
-    def sign(fields):
-        raw = "&".join([f"{k}={fields[k]}" for k in sorted(fields.keys())]) + api_secret
-        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    def save(self) -> None:
+        if not self.path:
+            return
+        # Other pipeline runs may have saved since we loaded: merge only what this run recorded.
+        with self.lock, gen.file_lock(self.path):
+            merged = {"stages": {}, "items": {}, **self.load()}
+            for name in self.dirty_stages:
+                merged["stages"][name] = self.data["stages"][name]
+            for stage, fingerprints in self.dirty_items.items():
+                items = merged["items"].setdefault(stage, {})
+                for item_fingerprint in fingerprints:
+                    record = self.data["items"].get(stage, {}).get(item_fingerprint)
+                    if record is not None:
+                        items.pop(item_fingerprint, None)
+                        items[item_fingerprint] = record
+                while len(items) > STATE_ITEM_LIMIT:
+                    items.pop(next(iter(items)))
+            gen.write_json_atomic(self.path, merged, indent=2)
+            self.data = merged
+            self.dirty_stages.clear()
+            self.dirty_items.clear()
 
-    upload_url = f"https://api.cloudinary.com/v1_1/{cloud_name}/image/upload"
-    items = []
 
-    for idx, png_path in enumerate(png_files, start=1):
-        timestamp = int(time.time())
-        public_id = f"anivid-temp/z-image-examples/{png_path.stem}-{timestamp}-{idx}"
-        sign_fields = {
-            "format": "webp",
-            "overwrite": "true",
-            "public_id": public_id,
-            "timestamp": str(timestamp),
-        }
-        form = {
-            "file": "data:image/png;base64," + base64.b64encode(png_path.read_bytes()).decode("ascii"),
-            "public_id": public_id,
-            "timestamp": str(timestamp),
-            "overwrite": "true",
-            "format": "webp",
-            "api_key": api_key,
-            "signature": sign(sign_fields),
-        }
+def completed_stage(journal: gen.CheckpointJournal, stage: str) -> pathlib.Path | None:
+    for event in reversed(journal.events):
+        if event.get("event") == "stage" and event.get("stage") == stage:
+            output = pathlib.Path(event["output"])
+            return output if output.exists() else None
+    return None
 
-        req = urllib.request.Request(
-            upload_url,
-            data=urllib.parse.urlencode(form).encode("utf-8"),
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=240) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
 
-        secure_url = payload.get("secure_url")
-        if not secure_url:
-            raise RuntimeError(f"Missing Cloudinary secure_url for {png_path.name}")
+def run_stage(
+    journal: gen.CheckpointJournal,
+    state: PipelineState,
+    decisions: dict[str, dict],
+    stage: str,
+    stage_fingerprint: str,
+    run,
+) -> pathlib.Path:
+    output = completed_stage(journal, stage)
+    if output is not None:
+        decision = {"decision": "skip", "reason": "completed in this work dir"}
+    else:
+        output = state.reusable_stage(stage, stage_fingerprint)
+        if output is not None:
+            decision = {"decision": "skip", "reason": "inputs unchanged"}
+        else:
+            previous = state.stage(stage)
+            if previous is None:
+                reason = "no previous run"
+            elif previous.get("fingerprint") != stage_fingerprint:
+                reason = "inputs changed"
+            else:
+                reason = "previous output missing, modified, or incomplete"
+            try:
+                with gen.METRICS.span("stage", stage=stage):
+                    output = run()
+                if summary_complete(output):
+                    state.record_stage(stage, stage_fingerprint, output)
+            finally:
+                state.save()
+            decision = {"decision": "run", "reason": reason}
+        journal.append("stage", stage=stage, output=str(output))
+
+    if decision["decision"] == "skip":
+        print(f"Skipping {stage}: {decision['reason']} ({output})", file=sys.stderr)
+    decision.update({"fingerprint": stage_fingerprint, "output": str(output)})
+    if stage in state.item_stats:
+        decision["items"] = state.item_stats[stage]
+    decisions[stage] = decision
+    return output
 
-        out_path = webp_dir / f"{png_path.stem}.webp"
-        with urllib.request.urlopen(
-            urllib.request.Request(secure_url, headers={"User-Agent": "Mozilla/5.0"}),
-            timeout=240,
-        ) as r:
-            out_path.write_bytes(r.read())
 
-        items.append(
+def prepare_generation(args, work_dir: pathlib.Path, journal: gen.CheckpointJournal) -> tuple[list[str], list[dict]]:
+    run_event = journal.first("run")
+    if run_event is None:
+        args.run_id = args.run_id or datetime.now().strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+        journal.append("run", run_id=args.run_id, model_uuid=args.model_uuid, types=args.types)
+    else:
+        args.run_id = run_event["run_id"]
+        args.model_uuid = run_event["model_uuid"]
+        args.types = run_event["types"]
+
+    style_types = gen.parse_types(args.types)
+    requests_jsonl = work_dir / "requests.jsonl"
+    if run_event is not None and requests_jsonl.exists():
+        payloads = [
+            json.loads(line)
+            for line in requests_jsonl.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+    else:
+        payloads = gen.build_payloads(args, style_types)
+        gen.write_jsonl(str(requests_jsonl), payloads)
+    return style_types, payloads
+
+
+def run_generation(
+    args,
+    work_dir: pathlib.Path,
+    journal: gen.CheckpointJournal,
+    state: PipelineState,
+    style_types: list[str],
+    payloads: list[dict],
+    on_result=None,
+) -> pathlib.Path:
+    headers = gen.resolve_provider_headers("kie", gen.parse_headers([]))
+    callbacks = None
+    if args.callback:
+        callbacks = gen.CallbackReceiver(args.callback_host, args.callback_port, args.callback_public_url)
+
+    with callbacks if callbacks is not None else contextlib.nullcontext():
+        records, results = gen.run_tasks(
+            args,
+            style_types,
+            payloads,
+            headers,
+            callbacks,
+            str(work_dir),
+            journal,
+            allow_create_failures=True,
+            on_result=on_result,
+        )
+
+    manifest = {
+        "tasks": [],
+        "model": args.model_uuid,
+        "run_id": args.run_id,
+        "created_at": datetime.now().isoformat(),
+    }
+    status_map = {"completed": "success", "failed": "fail"}
+    for index, (record, result) in enumerate(zip(records, results), start=1):
+        task = {"index": index, "style_key": record["style_key"]}
+        if "create_error" in record:
+            task.update({"status": "create_failed", "prompt": record["payload"]["prompt"]})
+            manifest["tasks"].append(task)
+            state.count("generation", "run")
+            continue
+
+        task.update(
             {
-                "source_png": str(png_path),
-                "webp_path": str(out_path),
-                "cloudinary_url": secure_url,
-                "png_size": png_path.stat().st_size,
-                "webp_size": out_path.stat().st_size,
+                "status": status_map.get(result["status"], result["status"]),
+                "task_id": record["generation_uuid"],
+                "prompt": record["payload"]["prompt"],
+                "files": result["files"],
             }
         )
+        if result.get("cached"):
+            task["cached"] = True
+        elif result.get("raw") is not None:
+            task["last_query"] = result["raw"]
+        manifest["tasks"].append(task)
+        state.count("generation", "reused" if result.get("cached") else "run")
 
+    summary_path = work_dir / "generation-summary.json"
+    summary_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return summary_path
+
+
+def item_files_intact(item: dict) -> bool:
+    files = [(item["webp_path"], item["webp_size"])] + [(v["path"], v["size"]) for v in item.get("variants", [])]
+    return all(os.path.exists(path) and os.path.getsize(path) == size for path, size in files)
+
+
+def converted_items(journal: gen.CheckpointJournal) -> dict[str, dict]:
+    return {
+        event["item"]["source_png"]: event["item"]
+        for event in journal.events
+        if event.get("event") == "convert" and item_files_intact(event["item"])
+    }
+
+
+def write_webp_summary(work_dir: pathlib.Path, items: list[dict], failed: list[dict] | None = None) -> pathlib.Path:
     summary = {
         "count": len(items),
         "total_png_size": sum(i["png_size"] for i in items),
         "total_webp_size": sum(i["webp_size"] for i in items),
+        "total_variant_size": sum(v["size"] for i in items for v in i.get("variants", [])),
         "items": items,
+        "failed": failed or [],
     }
     summary_path = work_dir / "webp-conversion-summary.json"
     summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
     return summary_path
 
 
-def upload_to_r2(work_dir: pathlib.Path) -> pathlib.Path:
-    helper = work_dir / "upload_to_r2_helper.ts"
-    helper.write_text(
-        """
-import { config } from \"dotenv\";
-import fs from \"node:fs/promises\";
-import path from \"node:path\";
-import { Storage } from \"../../src/lib/storage\";
+def generated_pngs(generation_summary: pathlib.Path) -> list[pathlib.Path]:
+    manifest = json.loads(generation_summary.read_text(encoding="utf-8"))
+    png_files = [
+        pathlib.Path(file["local_path"])
+        for task in manifest.get("tasks", [])
+        if task.get("status") == "success"
+        for file in task.get("files", [])
+        if file["local_path"].endswith(".png") and os.path.exists(file["local_path"])
+    ]
+    if not png_files:
+        raise RuntimeError("No PNG files found to convert")
+    return sorted(png_files)
+
+
+def encode_webp(png_path: str, out_path: str, quality: int, method: int) -> dict:
+    from PIL import Image
 
-async function main() {
-  config({ path: \".env.production\", override: true });
-  config({ path: \".env.development\", override: false });
+    partial_path = out_path + ".part"
+    with Image.open(png_path) as image:
+        image.save(partial_path, format="WEBP", quality=quality, method=method)
+    os.replace(partial_path, out_path)
+    return {
+        "source_png": png_path,
+        "webp_path": out_path,
+        "png_size": os.path.getsize(png_path),
+        "webp_size": os.path.getsize(out_path),
+    }
 
-  const baseDir = process.argv[2];
-  const outPath = process.argv[3];
-  if (!baseDir || !outPath) throw new Error(\"Missing args\");
 
-  const files = (await fs.readdir(baseDir)).filter((f) => f.endsWith(\".webp\")).sort();
-  if (!files.length) throw new Error(\"No webp files found\");
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "avif": ("AVIF", "image/avif")}
 
-  const storage = new Storage();
-  const uploaded = [];
 
-  for (const file of files) {
-    const full = path.join(baseDir, file);
-    const buf = await fs.readFile(full);
-    const key = `gallery/anime/z-image/${file}`;
-    const result = await storage.uploadFile({ body: buf, key, contentType: \"image/webp\", disposition: \"inline\" });
-    uploaded.push({ file, key, url: result.url, size: buf.length });
-  }
+def avif_supported() -> bool:
+    from PIL import Image
 
-  await fs.writeFile(outPath, JSON.stringify({ count: uploaded.length, uploaded }, null, 2), \"utf-8\");
-}
+    # Pillow < 11.2 only writes AVIF through the pillow-avif-plugin package.
+    with contextlib.suppress(ImportError):
+        import pillow_avif  # noqa: F401
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+def encode_variant(png_path: str, out_path: str, width: int, image_format: str, quality: int, method: int) -> dict | None:
+    from PIL import Image
+
+    if image_format == "avif":
+        avif_supported()
+    with Image.open(png_path) as image:
+        if width >= image.width:
+            return None
+        height = round(image.height * width / image.width)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    options = {"quality": quality}
+    if image_format == "webp":
+        options["method"] = method
+    partial_path = out_path + ".part"
+    resized.save(partial_path, format=VARIANT_FORMATS[image_format][0], **options)
+    os.replace(partial_path, out_path)
+    return {"format": image_format, "width": width, "height": height, "path": out_path, "size": os.path.getsize(out_path)}
+
+
+def webp_settings(args) -> dict:
+    if args.webp_backend == "cloudinary":
+        return {"backend": "cloudinary"}
+    settings = {"backend": "local", "quality": args.webp_quality, "method": args.webp_method}
+    if args.variant_widths and args.variant_formats:
+        settings["variants"] = {
+            "widths": args.variant_widths,
+            "formats": args.variant_formats,
+            "avif_quality": args.avif_quality,
+        }
+    return settings
+
+
+class WebpConverter:
+    def __init__(
+        self,
+        work_dir: pathlib.Path,
+        journal: gen.CheckpointJournal,
+        state: PipelineState,
+        settings: dict,
+        workers: int,
+    ) -> None:
+        if settings["backend"] == "local":
+            if importlib.util.find_spec("PIL") is None:
+                raise RuntimeError("Local WebP encoding requires Pillow (pip install Pillow), or pass --webp-backend cloudinary")
+            self.credentials = None
+        else:
+            self.credentials = cloudinary_credentials()
+
+        self.work_dir = work_dir
+        self.webp_dir = work_dir / "webp"
+        self.webp_dir.mkdir(exist_ok=True)
+        self.journal = journal
+        self.state = state
+        self.settings = settings
+        self.workers = workers
+        self.converted = converted_items(journal)
+        self.items: dict[str, dict] = {}
+        self.failed: list[dict] = []
+        self.lock = threading.Lock()
+        self.pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "WebpConverter":
+        if self.credentials is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def variant_path(self, png_path: pathlib.Path, width: int, image_format: str) -> pathlib.Path:
+        return self.webp_dir / f"{png_path.stem}-w{width}.{image_format}"
+
+    def reuse(self, png_path: pathlib.Path, out_path: pathlib.Path, item_fingerprint: str) -> dict | None:
+        if str(png_path) in self.converted:
+            return self.converted[str(png_path)]
+        record = self.state.item("webp", item_fingerprint)
+        if not record or not item_files_intact(record):
+            return None
+        item = {**record, "source_png": str(png_path), "webp_path": str(out_path)}
+        if os.path.abspath(record["webp_path"]) != os.path.abspath(out_path):
+            gen.link_or_copy(record["webp_path"], str(out_path))
+            if "variants" in record:
+                item["variants"] = []
+                for variant in record["variants"]:
+                    path = str(self.variant_path(png_path, variant["width"], variant["format"]))
+                    gen.link_or_copy(variant["path"], path)
+                    item["variants"].append({**variant, "path": path})
+        self.journal.append("convert", item=item)
+        return item
+
+    def encode(self, png_path: pathlib.Path, out_path: pathlib.Path) -> dict:
+        settings = self.settings
+        original = self.pool.submit(encode_webp, str(png_path), str(out_path), settings["quality"], settings["method"])
+        if "variants" not in settings:
+            return original.result()
+
+        variant_settings = settings["variants"]
+        variants = [
+            self.pool.submit(
+                encode_variant,
+                str(png_path),
+                str(self.variant_path(png_path, width, image_format)),
+                width,
+                image_format,
+                variant_settings["avif_quality"] if image_format == "avif" else settings["quality"],
+                settings["method"],
+            )
+            for width in variant_settings["widths"]
+            for image_format in variant_settings["formats"]
+        ]
+        item = original.result()
+        item["variants"] = [variant for variant in (future.result() for future in variants) if variant is not None]
+        return item
+
+    def convert(self, idx: int, png_path: pathlib.Path) -> dict:
+        out_path = self.webp_dir / f"{png_path.stem}.webp"
+        item_fingerprint = fingerprint("webp", file_digest(png_path), self.settings)
+        item = self.reuse(png_path, out_path, item_fingerprint)
+        if item is not None:
+            self.state.count("webp", "reused")
+        else:
+            self.state.count("webp", "run")
+            with gen.METRICS.span("webp_convert", backend=self.settings["backend"]):
+                if self.pool is not None:
+                    item = self.encode(png_path, out_path)
+                else:
+                    item = cloudinary_convert(idx, png_path, out_path, self.credentials)
+
+            if "error" in item:
+                print(f"WebP conversion failed for {item['source_png']}: {item['error']}", file=sys.stderr)
+                with self.lock:
+                    self.failed.append(item)
+                return item
+            self.journal.append("convert", item=item)
+            self.state.record_item("webp", item_fingerprint, item)
+
+        with self.lock:
+            self.items[str(png_path)] = item
+        return item
+
+    def write_summary(self, png_files: list[pathlib.Path]) -> pathlib.Path:
+        if not self.items:
+            raise RuntimeError(f"All {len(png_files)} WebP conversions failed")
+        items = [self.items[str(path)] for path in png_files if str(path) in self.items]
+        failed = sorted(self.failed, key=lambda item: item["source_png"])
+        return write_webp_summary(self.work_dir, items, failed)
 
-main().catch((error) => {
-  console.error(error);
-  process.exit(1);
-});
-""".strip(),
-        encoding="utf-8",
+
+def convert_to_webp(
+    work_dir: pathlib.Path,
+    journal: gen.CheckpointJournal,
+    state: PipelineState,
+    png_files: list[pathlib.Path],
+    settings: dict,
+    workers: int,
+) -> pathlib.Path:
+    with WebpConverter(work_dir, journal, state, settings, workers) as converter:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(converter.convert, range(1, len(png_files) + 1), png_files))
+    return converter.write_summary(png_files)
+
+
+MULTIPART_CHUNK_SIZE = 256 * 1024
+
+
+def multipart_body(fields: dict[str, str], file_field: str, file_path: pathlib.Path, file_type: str):
+    boundary = f"----anivid-{os.urandom(12).hex()}"
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+        for name, value in fields.items()
     )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_path.name}"\r\n'
+        f"Content-Type: {file_type}\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+    length = len(head) + file_path.stat().st_size + len(tail)
+
+    def chunks():
+        yield head
+        with file_path.open("rb") as f:
+            while True:
+                chunk = f.read(MULTIPART_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        yield tail
+
+    return f"multipart/form-data; boundary={boundary}", length, chunks
+
+
+CLOUDINARY_MAX_ATTEMPTS = 4
+CLOUDINARY_RETRY_BASE_SECONDS = 2.0
+CLOUDINARY_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def cloudinary_credentials() -> tuple[str, str, str]:
+    cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME", "")
+    api_key = os.environ.get("CLOUDINARY_API_KEY", "")
+    api_secret = os.environ.get("CLOUDINARY_API_SECRET", "")
+    if not cloud_name or not api_key or not api_secret:
+        raise RuntimeError("Cloudinary env is missing")
+    return cloud_name, api_key, api_secret
+
 
-    webp_dir = work_dir / "webp"
-    out_path = work_dir / "r2-upload-summary.json"
-    subprocess.run(
-        ["pnpm", "tsx", str(helper), str(webp_dir), str(out_path)],
-        check=True,
+def cloudinary_upload(idx: int, png_path: pathlib.Path, credentials: tuple[str, str, str]) -> tuple[int, bytes]:
+    cloud_name, api_key, api_secret = credentials
+    timestamp = int(time.time())
+    public_id = f"anivid-temp/z-image-examples/{png_path.stem}-{timestamp}-{idx}"
+    sign_fields = {
+        "format": "webp",
+        "overwrite": "true",
+        "public_id": public_id,
+        "timestamp": str(timestamp),
+    }
+    raw = "&".join([f"{k}={sign_fields[k]}" for k in sorted(sign_fields.keys())]) + api_secret
+    fields = {
+        "public_id": public_id,
+        "timestamp": str(timestamp),
+        "overwrite": "true",
+        "format": "webp",
+        "api_key": api_key,
+        "signature": hashlib.sha1(raw.encode("utf-8")).hexdigest(),
+    }
+    content_type, length, body = multipart_body(fields, "file", png_path, "image/png")
+    return gen.HTTP_CLIENT.request(
+        "POST",
+        f"https://api.cloudinary.com/v1_1/{cloud_name}/image/upload",
+        headers={"Content-Type": content_type, "Content-Length": str(length)},
+        body=body,
+        read_timeout=240,
     )
-    return out_path
+
+
+def cloudinary_convert(
+    idx: int,
+    png_path: pathlib.Path,
+    out_path: pathlib.Path,
+    credentials: tuple[str, str, str],
+) -> dict:
+    secure_url = ""
+    error = ""
+    for attempt in range(1, CLOUDINARY_MAX_ATTEMPTS + 1):
+        if attempt > 1:
+            gen.METRICS.inc("cloudinary_retries_total")
+            delay = CLOUDINARY_RETRY_BASE_SECONDS * 2 ** (attempt - 2)
+            time.sleep(delay * random.uniform(0.8, 1.2))
+
+        if not secure_url:
+            try:
+                status, raw = cloudinary_upload(idx, png_path, credentials)
+            except (OSError, http.client.HTTPException) as upload_error:
+                error = f"Cloudinary upload error: {upload_error}"
+                continue
+            if status < 200 or status >= 300:
+                error = f"Cloudinary upload failed: {status}, body: {raw.decode('utf-8', errors='replace')[:500]}"
+                if status in CLOUDINARY_RETRY_STATUSES:
+                    continue
+                break
+            try:
+                secure_url = json.loads(raw.decode("utf-8")).get("secure_url", "")
+            except ValueError:
+                secure_url = ""
+            if not secure_url:
+                error = f"Missing Cloudinary secure_url for {png_path.name}"
+                break
+
+        try:
+            gen.download_file(secure_url, str(out_path), headers={"User-Agent": "Mozilla/5.0"}, read_timeout=240)
+        except (OSError, RuntimeError, http.client.HTTPException) as download_error:
+            error = f"Cloudinary download error: {download_error}"
+            continue
+
+        return {
+            "source_png": str(png_path),
+            "webp_path": str(out_path),
+            "cloudinary_url": secure_url,
+            "png_size": png_path.stat().st_size,
+            "webp_size": out_path.stat().st_size,
+        }
+
+    return {"source_png": str(png_path), "error": error, "attempts": attempt}
+
+
+R2_KEY_PREFIX = "gallery/anime/z-image"
+R2_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+R2_PART_SIZE = 8 * 1024 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def canonical_request(method: str, url: str, signed: dict[str, str], payload_hash: str) -> str:
+    parsed = urllib.parse.urlsplit(url)
+    names = sorted(signed)
+    query = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+    canonical_query = "&".join(
+        f"{urllib.parse.quote(k, safe='-_.~')}={urllib.parse.quote(v, safe='-_.~')}" for k, v in sorted(query)
+    )
+    return "\n".join(
+        [
+            method,
+            # The path is signed exactly as sent; object_url has already percent-encoded the key once.
+            parsed.path or "/",
+            canonical_query,
+            "".join(f"{name}:{signed[name]}\n" for name in names),
+            ";".join(names),
+            payload_hash,
+        ]
+    )
+
+
+def sigv4_headers(
+    method: str,
+    url: str,
+    headers: dict[str, str],
+    payload_hash: str,
+    region: str,
+    access_key: str,
+    secret_key: str,
+    now: datetime | None = None,
+) -> dict[str, str]:
+    amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+
+    signed = {key.lower(): " ".join(str(value).split()) for key, value in headers.items()}
+    signed["host"] = urllib.parse.urlsplit(url).netloc
+    signed["x-amz-content-sha256"] = payload_hash
+    signed["x-amz-date"] = amz_date
+    names = sorted(signed)
+    request = canonical_request(method, url, signed, payload_hash)
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(request.encode("utf-8")).hexdigest()]
+    )
+
+    key = f"AWS4{secret_key}".encode("utf-8")
+    for part in [amz_date[:8], region, "s3", "aws4_request"]:
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    result = dict(headers)
+    result["x-amz-content-sha256"] = payload_hash
+    result["x-amz-date"] = amz_date
+    result["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return result
+
+
+def file_range_body(path: pathlib.Path, offset: int, length: int):
+    def chunks():
+        with path.open("rb") as f:
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(MULTIPART_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return chunks
+
+
+class R2Uploader:
+    def __init__(self) -> None:
+        self.endpoint = os.environ.get("STORAGE_ENDPOINT", "").rstrip("/")
+        self.access_key = os.environ.get("STORAGE_ACCESS_KEY", "")
+        self.secret_key = os.environ.get("STORAGE_SECRET_KEY", "")
+        self.bucket = os.environ.get("STORAGE_BUCKET", "")
+        self.region = os.environ.get("STORAGE_REGION", "") or "auto"
+        self.domain = os.environ.get("STORAGE_DOMAIN", "").rstrip("/")
+        if not self.endpoint or not self.access_key or not self.secret_key or not self.bucket:
+            raise RuntimeError("Storage env is missing (STORAGE_ENDPOINT, STORAGE_ACCESS_KEY, STORAGE_SECRET_KEY, STORAGE_BUCKET)")
+
+    def object_url(self, key: str) -> str:
+        return f"{self.endpoint}/{self.bucket}/{urllib.parse.quote(key, safe='/-_.~')}"
+
+    def public_url(self, key: str) -> str:
+        return f"{self.domain}/{key}" if self.domain else f"{self.endpoint}/{self.bucket}/{key}"
+
+    def send(self, method: str, url: str, headers: dict[str, str], body=None) -> tuple[int, bytes, str]:
+        signed = sigv4_headers(method, url, headers, UNSIGNED_PAYLOAD, self.region, self.access_key, self.secret_key)
+        with gen.HTTP_CLIENT.open(method, url, headers=signed, body=body) as response:
+            raw = response.read()
+            etag = response.getheader("ETag") or ""
+        if response.status < 200 or response.status >= 300:
+            raise RuntimeError(f"R2 {method} failed: {response.status}, url: {url}, body: {raw.decode('utf-8', errors='replace')[:500]}")
+        return response.status, raw, etag
+
+    def upload_file(self, path: pathlib.Path, key: str, content_type: str) -> None:
+        size = path.stat().st_size
+        headers = {"Content-Type": content_type, "Content-Disposition": "inline"}
+        url = self.object_url(key)
+        if size < R2_MULTIPART_THRESHOLD:
+            self.send("PUT", url, {**headers, "Content-Length": str(size)}, file_range_body(path, 0, size))
+            return
+
+        _, raw, _ = self.send("POST", f"{url}?uploads", {**headers, "Content-Length": "0"}, b"")
+        upload_id = ElementTree.fromstring(raw).findtext("{*}UploadId") or ""
+        if not upload_id:
+            raise RuntimeError(f"Missing UploadId for {key}")
+        upload_query = urllib.parse.quote(upload_id, safe="")
+
+        try:
+            etags = []
+            for number, offset in enumerate(range(0, size, R2_PART_SIZE), start=1):
+                length = min(R2_PART_SIZE, size - offset)
+                _, _, etag = self.send(
+                    "PUT",
+                    f"{url}?partNumber={number}&uploadId={upload_query}",
+                    {"Content-Length": str(length)},
+                    file_range_body(path, offset, length),
+                )
+                etags.append(etag)
+
+            complete = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, start=1)
+            )
+            body = f"<CompleteMultipartUpload>{complete}</CompleteMultipartUpload>".encode("utf-8")
+            self.send(
+                "POST",
+                f"{url}?uploadId={upload_query}",
+                {"Content-Type": "application/xml", "Content-Length": str(len(body))},
+                body,
+            )
+        except Exception:
+            with contextlib.suppress(Exception):
+                self.send("DELETE", f"{url}?uploadId={upload_query}", {})
+            raise
+
+
+class R2Publisher:
+    def __init__(self, work_dir: pathlib.Path, state: PipelineState) -> None:
+        self.work_dir = work_dir
+        self.state = state
+        self.uploader = R2Uploader()
+        self.uploaded: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def upload(self, path: pathlib.Path, content_type: str) -> dict:
+        key = f"{R2_KEY_PREFIX}/{path.name}"
+        target = [self.uploader.endpoint, self.uploader.bucket, self.uploader.domain, key]
+        item_fingerprint = fingerprint("r2", file_digest(path), target)
+        item = self.state.item("r2", item_fingerprint)
+        if item:
+            self.state.count("r2", "reused")
+        else:
+            self.state.count("r2", "run")
+            with gen.METRICS.span("r2_upload"):
+                self.uploader.upload_file(path, key, content_type)
+            item = {"file": path.name, "key": key, "url": self.uploader.public_url(key), "size": path.stat().st_size}
+            self.state.record_item("r2", item_fingerprint, item)
+        return item
+
+    def publish(self, webp_item: dict) -> dict:
+        path = pathlib.Path(webp_item["webp_path"])
+        item = self.upload(path, "image/webp")
+        if "variants" in webp_item:
+            item = {
+                **item,
+                "variants": [
+                    {
+                        **self.upload(pathlib.Path(variant["path"]), VARIANT_FORMATS[variant["format"]][1]),
+                        "format": variant["format"],
+                        "width": variant["width"],
+                        "height": variant["height"],
+                    }
+                    for variant in webp_item["variants"]
+                ],
+            }
+        with self.lock:
+            self.uploaded[path.name] = item
+        return item
+
+    def write_summary(self, webp_items: list[dict]) -> pathlib.Path:
+        names = [pathlib.Path(item["webp_path"]).name for item in webp_items]
+        uploaded = [self.uploaded[name] for name in names if name in self.uploaded]
+        out_path = self.work_dir / "r2-upload-summary.json"
+        out_path.write_text(json.dumps({"count": len(uploaded), "uploaded": uploaded}, ensure_ascii=False, indent=2), encoding="utf-8")
+        return out_path
+
+
+def summary_webp_items(webp_summary: pathlib.Path) -> list[dict]:
+    summary = json.loads(webp_summary.read_text(encoding="utf-8"))
+    return sorted(summary.get("items", []), key=lambda item: item["webp_path"])
+
+
+def upload_to_r2(
+    work_dir: pathlib.Path,
+    state: PipelineState,
+    webp_summary: pathlib.Path,
+    workers: int,
+) -> pathlib.Path:
+    publisher = R2Publisher(work_dir, state)
+    items = summary_webp_items(webp_summary)
+    if not items:
+        raise RuntimeError("No webp files found")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(publisher.publish, items))
+    return publisher.write_summary(items)
+
+
+def stream_pipeline(
+    args,
+    work_dir: pathlib.Path,
+    journal: gen.CheckpointJournal,
+    state: PipelineState,
+    style_types: list[str],
+    payloads: list[dict],
+    streamed: dict[str, pathlib.Path],
+) -> pathlib.Path:
+    converter = WebpConverter(work_dir, journal, state, webp_settings(args), args.webp_workers)
+    publisher = R2Publisher(work_dir, state)
+    convert_queue: queue.Queue = queue.Queue(maxsize=args.stream_queue_size)
+    upload_queue: queue.Queue = queue.Queue(maxsize=args.stream_queue_size)
+    errors: list[str] = []
+    convert_workers = args.cloudinary_workers if args.webp_backend == "cloudinary" else args.webp_workers
+
+    def on_result(index: int, result: dict) -> None:
+        if result.get("status") != "completed":
+            return
+        for file in result.get("files", []):
+            if file["local_path"].endswith(".png"):
+                convert_queue.put((index, pathlib.Path(file["local_path"])))
+
+    def convert_worker() -> None:
+        while (entry := convert_queue.get()) is not None:
+            try:
+                item = converter.convert(*entry)
+            except Exception as error:
+                errors.append(f"WebP conversion failed for {entry[1]}: {error}")
+                continue
+            if "error" not in item:
+                upload_queue.put(item)
+
+    def upload_worker() -> None:
+        while (item := upload_queue.get()) is not None:
+            try:
+                publisher.publish(item)
+            except Exception as error:
+                errors.append(f"R2 upload failed for {item['webp_path']}: {error}")
+
+    with converter, ThreadPoolExecutor(max_workers=convert_workers + args.r2_workers) as executor:
+        converting = [executor.submit(convert_worker) for _ in range(convert_workers)]
+        uploading = [executor.submit(upload_worker) for _ in range(args.r2_workers)]
+        try:
+            generation_summary = run_generation(args, work_dir, journal, state, style_types, payloads, on_result)
+        finally:
+            for _ in converting:
+                convert_queue.put(None)
+            for future in converting:
+                future.result()
+            for _ in uploading:
+                upload_queue.put(None)
+            for future in uploading:
+                future.result()
+
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    streamed["webp"] = converter.write_summary(generated_pngs(generation_summary))
+    streamed["r2"] = publisher.write_summary(summary_webp_items(streamed["webp"]))
+    return generation_summary
+
+
+CONFIG_PATH = "src/configs/gallery/models/z-image-examples.json"
+CONFIG_STYLE_META = {
+    "ink-wash-character": ("Ink Wash Character", "ink wash martial artist in misty mountains", "ink-wash"),
+    "cyberpunk-streetscape": ("Cyberpunk Streetscape", "cyberpunk futuristic city street scene", "cyberpunk"),
+    "anime-battle-clash": ("Anime Battle Clash", "anime battle clash with dynamic impact", "anime-action"),
+    "watercolor-landscape": ("Watercolor Landscape", "watercolor natural landscape scene", "watercolor"),
+    "noir-cityscape": ("Noir Cityscape", "neo-noir city alley atmosphere", "noir"),
+    "mecha-hangar": ("Mecha Hangar", "giant mecha in industrial hangar", "mecha"),
+    "ghibli-warm-story": ("Warm Story Scene", "warm storybook countryside scene", "warm-story"),
+    "surreal-dreamscape": ("Surreal Dreamscape", "surreal dream world with impossible architecture", "surreal"),
+    "photoreal-portrait-reference": ("Photoreal Portrait", "realistic portrait benchmark with natural skin texture", "photoreal-reference"),
+}
 
 
 def update_config(work_dir: pathlib.Path, generation_summary: pathlib.Path, r2_summary: pathlib.Path) -> pathlib.Path:
     manifest = json.loads(generation_summary.read_text(encoding="utf-8"))
     upload = json.loads(r2_summary.read_text(encoding="utf-8"))
 
-    key_by_style = {}
+    item_by_style = {}
     for item in upload.get("uploaded", []):
         name = pathlib.Path(item["key"]).name
         parts = name.split("-")
         style = "-".join(parts[1:-1])
-        key_by_style[style] = item["key"]
-
-    meta = {
-        "ink-wash-character": ("Ink Wash Character", "ink wash martial artist in misty mountains", "ink-wash"),
-        "cyberpunk-streetscape": ("Cyberpunk Streetscape", "cyberpunk futuristic city street scene", "cyberpunk"),
-        "anime-battle-clash": ("Anime Battle Clash", "anime battle clash with dynamic impact", "anime-action"),
-        "watercolor-landscape": ("Watercolor Landscape", "watercolor natural landscape scene", "watercolor"),
-        "noir-cityscape": ("Noir Cityscape", "neo-noir city alley atmosphere", "noir"),
-        "mecha-hangar": ("Mecha Hangar", "giant mecha in industrial hangar", "mecha"),
-        "ghibli-warm-story": ("Warm Story Scene", "warm storybook countryside scene", "warm-story"),
-        "surreal-dreamscape": ("Surreal Dreamscape", "surreal dream world with impossible architecture", "surreal"),
-        "photoreal-portrait-reference": ("Photoreal Portrait", "realistic portrait benchmark with natural skin texture", "photoreal-reference"),
-    }
+        item_by_style[style] = item
 
     examples = []
     for idx, task in enumerate(manifest.get("tasks", []), start=1):
         style = task.get("style_key", "")
-        title, alt, style_tag = meta.get(style, (style.replace("-", " ").title(), style, style))
-        r2_path = key_by_style.get(style)
-        if not r2_path:
+        title, alt, style_tag = CONFIG_STYLE_META.get(style, (style.replace("-", " ").title(), style, style))
+        item = item_by_style.get(style)
+        if not item:
             continue
 
+        variants = {}
+        if item.get("variants"):
+            variants["variants"] = [
+                {
+                    "r2_path": variant["key"],
+                    "format": variant["format"],
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "size": variant["size"],
+                }
+                for variant in item["variants"]
+            ]
         examples.append(
             {
                 "uuid": f"zi-ex-{idx:03d}",
-                "r2_path": r2_path,
+                "r2_path": item["key"],
+                **variants,
                 "alt": alt,
                 "aspect_ratio": "3:4",
                 "title": title,
@@ -314,7 +987,7 @@ def update_config(work_dir: pathlib.Path, generation_summary: pathlib.Path, r2_s
             }
         )
 
-    out_path = pathlib.Path("src/configs/gallery/models/z-image-examples.json")
+    out_path = pathlib.Path(CONFIG_PATH)
     output = {
         "version": "1.2.0",
         "lastUpdated": str(date.today()),
@@ -327,6 +1000,65 @@ def update_config(work_dir: pathlib.Path, generation_summary: pathlib.Path, r2_s
     return out_path
 
 
+def run_pipeline(args, work_dir: pathlib.Path, journal: gen.CheckpointJournal, state: PipelineState) -> dict:
+    decisions: dict[str, dict] = {}
+
+    style_types, payloads = prepare_generation(args, work_dir, journal)
+    streamed: dict[str, pathlib.Path] = {}
+    if args.stream:
+        generate = lambda: stream_pipeline(args, work_dir, journal, state, style_types, payloads, streamed)
+    else:
+        generate = lambda: run_generation(args, work_dir, journal, state, style_types, payloads)
+    generation_fp = fingerprint("generation", args.model_uuid, payloads)
+    generation_summary = run_stage(journal, state, decisions, "generation", generation_fp, generate)
+
+    webp_fp = fingerprint("webp", generation_fp, webp_settings(args))
+    webp_workers = args.cloudinary_workers if args.webp_backend == "cloudinary" else args.webp_workers
+    webp_summary = run_stage(
+        journal,
+        state,
+        decisions,
+        "webp",
+        webp_fp,
+        lambda: streamed.get("webp")
+        or convert_to_webp(
+            work_dir, journal, state, generated_pngs(generation_summary), webp_settings(args), webp_workers
+        ),
+    )
+
+    storage_target = [os.environ.get(name, "") for name in ["STORAGE_ENDPOINT", "STORAGE_BUCKET", "STORAGE_DOMAIN"]]
+    r2_fp = fingerprint("r2", webp_fp, storage_target, R2_KEY_PREFIX)
+    r2_summary = run_stage(
+        journal,
+        state,
+        decisions,
+        "r2",
+        r2_fp,
+        lambda: streamed.get("r2") or upload_to_r2(work_dir, state, webp_summary, args.r2_workers),
+    )
+
+    config_fp = fingerprint("config", generation_fp, r2_fp, CONFIG_PATH, CONFIG_STYLE_META)
+    config_path = run_stage(
+        journal,
+        state,
+        decisions,
+        "config",
+        config_fp,
+        lambda: update_config(work_dir, generation_summary, r2_summary),
+    )
+
+    result = {
+        "work_dir": str(work_dir),
+        "requests_jsonl": str(work_dir / "requests.jsonl"),
+        "generation_summary": str(generation_summary),
+        "webp_summary": str(webp_summary),
+        "r2_summary": str(r2_summary),
+        "config_path": str(config_path),
+        "stages": decisions,
+    }
+    return result
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run full z-image example pipeline")
     parser.add_argument("--model-uuid", default="z-image")
@@ -338,31 +1070,101 @@ def main() -> int:
     parser.add_argument("--theme", default="")
     parser.add_argument("--character", default="")
     parser.add_argument("--lock-character", action="store_true")
+    parser.add_argument("--run-id", default="")
     parser.add_argument("--work-dir", default="")
+    parser.add_argument("--resume", default="")
+    parser.add_argument("--state-path", default=DEFAULT_STATE_PATH)
+    parser.add_argument("--webp-backend", default="local", choices=["local", "cloudinary"])
+    parser.add_argument("--webp-quality", type=int, default=82)
+    parser.add_argument("--webp-method", type=int, default=6)
+    parser.add_argument("--webp-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--variant-widths", default="320,640,960")
+    parser.add_argument("--variant-formats", default="webp,avif")
+    parser.add_argument("--avif-quality", type=int, default=60)
+    parser.add_argument("--cloudinary-workers", type=int, default=4)
+    parser.add_argument("--r2-workers", type=int, default=8)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--stream-queue-size", type=int, default=8)
+    gen.add_scheduling_arguments(parser)
+    parser.set_defaults(
+        provider="kie",
+        api_base="",
+        collect=True,
+        batch_size=1,
+        visibility_level="public",
+        reference_image_urls="",
+    )
     args = parser.parse_args()
 
     load_env()
+    gen.apply_scheduling_args(args)
+
+    if not 0 <= args.webp_quality <= 100:
+        raise ValueError("webp_quality must be in range 0..100")
+
+    if not 0 <= args.webp_method <= 6:
+        raise ValueError("webp_method must be in range 0..6")
+
+    if args.webp_workers < 1:
+        raise ValueError("webp_workers must be at least 1")
+
+    args.variant_widths = sorted({int(width) for width in args.variant_widths.split(",") if width.strip()})
+    if any(width < 1 for width in args.variant_widths):
+        raise ValueError("variant_widths must be positive")
+
+    args.variant_formats = [name.strip() for name in args.variant_formats.split(",") if name.strip()]
+    unknown_formats = set(args.variant_formats) - set(VARIANT_FORMATS)
+    if unknown_formats:
+        raise ValueError(f"Unsupported variant formats: {', '.join(sorted(unknown_formats))}")
+
+    if not 0 <= args.avif_quality <= 100:
+        raise ValueError("avif_quality must be in range 0..100")
+
+    if (
+        "avif" in args.variant_formats
+        and args.variant_widths
+        and args.webp_backend == "local"
+        and importlib.util.find_spec("PIL") is not None
+        and not avif_supported()
+    ):
+        print("Pillow cannot write AVIF (upgrade to Pillow 11.2+ or install pillow-avif-plugin); skipping AVIF variants", file=sys.stderr)
+        args.variant_formats.remove("avif")
+
+    if args.cloudinary_workers < 1:
+        raise ValueError("cloudinary_workers must be at least 1")
+
+    if args.r2_workers < 1:
+        raise ValueError("r2_workers must be at least 1")
+
+    if args.stream_queue_size < 1:
+        raise ValueError("stream_queue_size must be at least 1")
 
     if not (os.environ.get("KIE_AI_API_KEY") or os.environ.get("API_KEY")):
         raise RuntimeError("Missing KIE key")
 
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    work_dir = pathlib.Path(args.work_dir) if args.work_dir else pathlib.Path(f".temp/z-image-full-pipeline-{timestamp}")
-    work_dir.mkdir(parents=True, exist_ok=True)
-
-    requests_jsonl, generation_summary = run_generation(args, work_dir)
-    webp_summary = cloudinary_to_webp(work_dir)
-    r2_summary = upload_to_r2(work_dir)
-    config_path = update_config(work_dir, generation_summary, r2_summary)
+    if args.resume:
+        work_dir = pathlib.Path(args.resume)
+        if not (work_dir / gen.JOURNAL_FILENAME).exists():
+            raise RuntimeError(f"No checkpoint journal found in {work_dir}")
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if args.work_dir:
+            work_dir = pathlib.Path(args.work_dir)
+            work_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            work_dir = pathlib.Path(f".temp/z-image-full-pipeline-{timestamp}-{os.getpid()}")
+            work_dir.mkdir(parents=True)
 
-    result = {
-        "work_dir": str(work_dir),
-        "requests_jsonl": str(requests_jsonl),
-        "generation_summary": str(generation_summary),
-        "webp_summary": str(webp_summary),
-        "r2_summary": str(r2_summary),
-        "config_path": str(config_path),
-    }
+    journal = gen.CheckpointJournal(str(work_dir / gen.JOURNAL_FILENAME))
+    if not args.resume:
+        # A reused --work-dir is a fresh run: its earlier run record and completed stages are not adopted.
+        journal.reset()
+    state = PipelineState(args.state_path)
+    try:
+        result = run_pipeline(args, work_dir, journal, state)
+    finally:
+        metrics_json, metrics_prom = gen.METRICS.write(str(work_dir))
+    result.update({"metrics": metrics_json, "metrics_prom": metrics_prom})
     print(json.dumps(result, ensure_ascii=False, indent=2))
     return 0
 
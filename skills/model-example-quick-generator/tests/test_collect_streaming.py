@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import batch_generate_examples as gen  # noqa: E402
+
+
+class MissingFileHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class CompletedCallbacks:
+    def __init__(self, events) -> None:
+        self.events = list(events)
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def wait(self, timeout) -> None:
+        pass
+
+
+class DownloadFailureTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MissingFileHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_failed_download_is_recorded_as_task_failure(self) -> None:
+        image_url = f"http://127.0.0.1:{self.server.server_address[1]}/a.png"
+        callbacks = CompletedCallbacks([("task-1", {"status": "completed", "urls": [image_url]})])
+        records = []
+
+        results = gen.collect_streaming(
+            "project",
+            "http://127.0.0.1:9",
+            {},
+            [{"index": 1, "style_key": "fantasy-epic", "generation_uuid": "task-1"}],
+            tempfile.mkdtemp(),
+            timeout_seconds=30,
+            interval_seconds=2,
+            poll_concurrency=1,
+            download_concurrency=1,
+            progress=None,
+            callbacks=callbacks,
+            on_result=lambda index, result: records.append(
+                gen.task_record(index, "fantasy-epic", {"model_uuid": "m"}, "task-1", result)
+            ),
+        )
+
+        self.assertEqual(results[0]["status"], "download_failed")
+        self.assertIn("404", results[0]["error_message"])
+        self.assertEqual(len(records), 1)
+        # The manifest.ndjson row must agree with the failed_tasks entry built from the same result.
+        self.assertEqual(records[0]["status"], "download_failed")
+        self.assertEqual(records[0]["error_message"], results[0]["error_message"])
+        self.assertEqual(records[0]["files"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import batch_generate_examples as gen  # noqa: E402
+
+SPAWN = multiprocessing.get_context("spawn")
+ENTRIES_PER_WRITER = 25
+
+
+def store_entries(cache_dir: str, writer: int) -> None:
+    cache = gen.GenerationCache(cache_dir, 1024 * 1024 * 1024)
+    source_dir = tempfile.mkdtemp()
+    for entry in range(ENTRIES_PER_WRITER):
+        path = os.path.join(source_dir, f"{entry}.png")
+        with open(path, "wb") as file:
+            file.write(f"{writer}-{entry}".encode("utf-8"))
+        cache.store(f"w{writer}-{entry}", f"task-{writer}-{entry}", [{"local_path": path, "source_url": path}])
+
+
+@unittest.skipIf(gen.fcntl is None, "the cache index lock needs POSIX file locks")
+class SharedCacheTest(unittest.TestCase):
+    def test_concurrent_writers_keep_each_others_entries(self) -> None:
+        cache_dir = tempfile.mkdtemp()
+        writers = [SPAWN.Process(target=store_entries, args=(cache_dir, writer)) for writer in range(2)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(timeout=60)
+            self.assertEqual(writer.exitcode, 0)
+
+        with open(os.path.join(cache_dir, "index.json"), "r", encoding="utf-8") as file:
+            index = json.load(file)
+        expected = {f"w{writer}-{entry}" for writer in range(2) for entry in range(ENTRIES_PER_WRITER)}
+        self.assertEqual(set(index), expected)
+
+        restored = gen.GenerationCache(cache_dir, 1024 * 1024 * 1024).restore("w1-7", tempfile.mkdtemp(), 1, "style")
+        self.assertEqual(restored["generation_uuid"], "task-1-7")
+
+
+if __name__ == "__main__":
+    unittest.main()
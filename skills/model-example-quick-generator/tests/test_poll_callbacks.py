@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import batch_generate_examples as gen  # noqa: E402
+
+
+class QueuedCallbacks:
+    # Stands in for CallbackReceiver: hands out the queued events once, then stays quiet.
+    def __init__(self, events) -> None:
+        self.events = list(events)
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def wait(self, timeout) -> None:
+        time.sleep(min(timeout or 0, 0.05))
+
+
+class EarlyCallbackTest(unittest.TestCase):
+    def test_callback_before_arrival_settles_on_arrival(self) -> None:
+        payload = {"status": "completed", "urls": ["https://cdn.example.com/a.png"]}
+        callbacks = QueuedCallbacks([("task-1", payload)])
+        batches = [[], [(0, "task-1")]]
+
+        def arrivals():
+            # The callback is drained in the first round, before the task's ID has been registered.
+            return batches.pop(0) if batches else []
+
+        started = time.monotonic()
+        results = list(
+            gen.iter_poll_results(
+                "project",
+                "http://127.0.0.1:9",
+                {},
+                [""],
+                timeout_seconds=3,
+                interval_seconds=2,
+                concurrency=1,
+                callbacks=callbacks,
+                fallback_interval_seconds=60,
+                arrivals=arrivals,
+            )
+        )
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(len(results), 1)
+        index, result = results[0]
+        self.assertEqual(index, 0)
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual(result["urls"], payload["urls"])
+        self.assertEqual(result["poll_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import batch_generate_examples as gen  # noqa: E402
+
+# Forked children would inherit the parent's slot locks, so workers start from a fresh interpreter.
+SPAWN = multiprocessing.get_context("spawn")
+LIMIT = 2
+WORKERS = 6
+ROUNDS = 5
+
+
+def hold_slots(directory: str, worker: int, events) -> None:
+    budget = gen.TaskBudget(directory, LIMIT)
+    for round_index in range(ROUNDS):
+        key = worker * ROUNDS + round_index
+        budget.acquire(key)
+        events.put(("acquire", worker, time.monotonic()))
+        time.sleep(0.02)
+        events.put(("release", worker, time.monotonic()))
+        budget.release(key)
+
+
+def wait_turn(directory: str, worker: int, events) -> None:
+    budget = gen.TaskBudget(directory, 1)
+    budget.acquire(worker)
+    events.put(worker)
+    budget.release(worker)
+
+
+def queued(directory: str) -> int:
+    return len(os.listdir(os.path.join(directory, "queue")))
+
+
+@unittest.skipIf(gen.fcntl is None, "task budget needs POSIX file locks")
+class TaskBudgetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.events = SPAWN.Queue()
+
+    def test_processes_never_exceed_limit(self) -> None:
+        workers = [
+            SPAWN.Process(target=hold_slots, args=(self.directory, worker, self.events))
+            for worker in range(WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+        events = [self.events.get(timeout=30) for _ in range(WORKERS * ROUNDS * 2)]
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertEqual(worker.exitcode, 0)
+
+        in_flight = peak = 0
+        # Releases are logged before the slot is freed and acquires after it is taken, so ties never overcount.
+        for kind, _, _ in sorted(events, key=lambda event: (event[2], event[0] == "acquire")):
+            in_flight += 1 if kind == "acquire" else -1
+            peak = max(peak, in_flight)
+        self.assertLessEqual(peak, LIMIT)
+        self.assertEqual(in_flight, 0)
+
+    def test_waiters_are_served_in_arrival_order(self) -> None:
+        holder = gen.TaskBudget(self.directory, 1)
+        holder.acquire(0)
+        workers = []
+        for worker in range(4):
+            process = SPAWN.Process(target=wait_turn, args=(self.directory, worker, self.events))
+            process.start()
+            workers.append(process)
+            deadline = time.monotonic() + 10
+            while queued(self.directory) <= worker and time.monotonic() < deadline:
+                time.sleep(0.01)
+        holder.release(0)
+
+        order = [self.events.get(timeout=30) for _ in workers]
+        for process in workers:
+            process.join(timeout=30)
+        self.assertEqual(order, list(range(4)))
+
+
+class ResumedTaskSlotsTest(unittest.TestCase):
+    def test_resumed_tasks_take_model_slots_before_polling(self) -> None:
+        directory = tempfile.mkdtemp()
+        journal = gen.CheckpointJournal(os.path.join(directory, gen.JOURNAL_FILENAME))
+        for index in (1, 2, 3):
+            journal.append("submit", index=index, generation_uuid=f"task-{index}")
+        journal.append("result", index=3, result={"status": "failed", "urls": [], "error_message": "boom"})
+        slots = gen.ModelSlots(1)
+        registered = []
+
+        submitter = threading.Thread(
+            target=gen.submit_pending,
+            args=("project", "http://127.0.0.1:9", {}, [{"model_uuid": "m"}] * 3, 1, gen.TokenBucket(0, 1)),
+            kwargs={
+                "journal": journal,
+                "model_slots": slots,
+                "on_created": lambda position, task: registered.append(position),
+            },
+        )
+        submitter.start()
+        time.sleep(0.2)
+        self.assertEqual(registered, [0])
+
+        slots.release(1)
+        submitter.join(timeout=5)
+        self.assertFalse(submitter.is_alive())
+        # The settled third task is handed over without holding a slot.
+        self.assertEqual(registered, [0, 1, 2])
+        self.assertEqual(slots.holders, {2: "m"})
+
+
+if __name__ == "__main__":
+    unittest.main()